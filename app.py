@@ -2,32 +2,120 @@
 # Imports
 #----------------------------------------------------------------------------#
 
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, flash, redirect, url_for, abort, jsonify
-from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
+import base64
+import collections
+import functools
+import gzip
+import hashlib
+import heapq
+import itertools
+import json
+import mimetypes
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from flask import Flask, render_template, request, flash, redirect, url_for, abort, jsonify, make_response, session, stream_with_context, g, has_request_context, send_from_directory
+from flask import before_render_template, template_rendered
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
 import logging
 from logging import Formatter, FileHandler, error
 from forms import *
-from sqlalchemy import exc
-from flask_migrate import Migrate
+from sqlalchemy import exc, event, orm
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+import click
+from jinja2 import FileSystemBytecodeCache
+from cache import create_cache
+from metrics import Registry
+from build_assets import BUNDLES
+from autocomplete import Autocomplete, PrefixIndex
+try:
+  import orjson
+except ImportError:
+  orjson = None
+try:
+  import brotli
+except ImportError:
+  brotli = None
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
 app = Flask(__name__)
-moment = Moment(app)
 app.config.from_object('config')
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+
+# Compiled templates are kept on disk, so a new process loads them instead of
+# compiling every template again
+if app.config['TEMPLATE_CACHE_DIR']:
+  os.makedirs(app.config['TEMPLATE_CACHE_DIR'], exist_ok = True)
+  app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['TEMPLATE_CACHE_DIR'])
+
+class RoutingSession(SignallingSession):
+  # Sends the statements of read-only views (see read_only below) to the
+  # replica picked for the request; flushes and everything else go to the
+  # primary engine.
+  def __init__(self, db, **options):
+    self.db = db
+    super().__init__(db, **options)
+
+  def get_bind(self, mapper=None, clause=None):
+    bind = g.get('replica_bind') if has_request_context() else None
+    if bind is not None and not self._flushing:
+      return self.db.get_engine(self.app, bind = bind)
+    return super().get_bind(mapper, clause)
+
+class FyyurSQLAlchemy(SQLAlchemy):
+  def create_session(self, options):
+    return orm.sessionmaker(class_ = RoutingSession, db = self, **options)
+
+  def create_engine(self, sa_url, engine_opts):
+    # SQLite gets a NullPool or StaticPool, which take no pool sizing options
+    if sa_url.drivername.startswith('sqlite'):
+      engine_opts = {k: v for k, v in engine_opts.items() if k not in ('pool_size', 'max_overflow', 'pool_timeout')}
+    return super().create_engine(sa_url, engine_opts)
+
+db = FyyurSQLAlchemy(app)
+
+# Flask-Migrate (and alembic) are only imported when the app is loaded by the
+# `flask` command, where `flask db ...` needs them
+if click.get_current_context(silent = True) is not None:
+  from flask_migrate import Migrate
+  migrate = Migrate(app, db)
 
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 
+venue_genres = db.Table('venue_genre',
+    db.Column('venue_id', db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), primary_key = True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id', ondelete='CASCADE'), primary_key = True),
+    db.Index('ix_venue_genre_genre_id', 'genre_id', 'venue_id')
+)
+
+artist_genres = db.Table('artist_genre',
+    db.Column('artist_id', db.Integer, db.ForeignKey('artist.id', ondelete='CASCADE'), primary_key = True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id', ondelete='CASCADE'), primary_key = True),
+    db.Index('ix_artist_genre_genre_id', 'genre_id', 'artist_id')
+)
+
+class Genre(db.Model):
+    __tablename__ = 'genre'
+
+    id = db.Column(db.Integer, primary_key = True)
+    name = db.Column(db.String, nullable = False, unique = True)
+
+    def __repr__(self):
+      return f'<Genre name={self.name}>'
+
 class Venue(db.Model):
     __tablename__ = 'venue'
+    __table_args__ = (
+        db.Index('ix_venue_city_state', 'city', 'state', 'id'),
+        db.Index('ix_venue_updated_at', 'updated_at'),
+    )
 
     id = db.Column(db.Integer, primary_key = True)
     name = db.Column(db.String, nullable = False)
@@ -35,12 +123,18 @@ class Venue(db.Model):
     state = db.Column(db.String, nullable = False)
     address = db.Column(db.String, nullable = False)
     phone = db.Column(db.String)
-    genres = db.Column(db.String)
+    genres = db.relationship('Genre', secondary=venue_genres, lazy='selectin', order_by='Genre.name')
     image_link = db.Column(db.String)
     facebook_link = db.Column(db.String)
     website = db.Column(db.String)
     seeking_talent = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.String)
+    # kept current by count_show() and rollover_shows()
+    upcoming_shows_count = db.Column(db.Integer, nullable = False, default = 0, server_default = '0')
+    past_shows_count = db.Column(db.Integer, nullable = False, default = 0, server_default = '0')
+    # bumped on every write, see "Conditional requests"
+    version = db.Column(db.Integer, nullable = False, default = 1, server_default = '1')
+    updated_at = db.Column(db.DateTime, nullable = False, default = datetime.utcnow, server_default = db.func.now())
 
     shows = db.relationship('Show', backref='venue', lazy=True)
 
@@ -49,18 +143,28 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = 'artist'
+    __table_args__ = (
+        db.Index('ix_artist_name', 'name', 'id'),
+        db.Index('ix_artist_updated_at', 'updated_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable = False)
     city = db.Column(db.String, nullable = False)
     state = db.Column(db.String, nullable = False)
     phone = db.Column(db.String)
-    genres = db.Column(db.String, nullable = False)
+    genres = db.relationship('Genre', secondary=artist_genres, lazy='selectin', order_by='Genre.name')
     image_link = db.Column(db.String)
     facebook_link = db.Column(db.String)
     website = db.Column(db.String)
     seeking_venue = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.String)
+    # kept current by count_show() and rollover_shows()
+    upcoming_shows_count = db.Column(db.Integer, nullable = False, default = 0, server_default = '0')
+    past_shows_count = db.Column(db.Integer, nullable = False, default = 0, server_default = '0')
+    # bumped on every write, see "Conditional requests"
+    version = db.Column(db.Integer, nullable = False, default = 1, server_default = '1')
+    updated_at = db.Column(db.DateTime, nullable = False, default = datetime.utcnow, server_default = db.func.now())
 
     shows = db.relationship('Show', backref='artist', lazy=True)
 
@@ -69,31 +173,836 @@ class Artist(db.Model):
 
 class Show(db.Model):
     __tablename__ = 'show'
+    __table_args__ = (
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_show_start_time', 'start_time', 'id'),
+        db.Index('ix_show_counted_past_start_time', 'counted_past', 'start_time'),
+        db.Index('ix_show_updated_at', 'updated_at'),
+    )
 
     id = db.Column(db.Integer, primary_key = True)
     artist_id = db.Column(db.Integer, db.ForeignKey('artist.id'), nullable=False)
     venue_id = db.Column(db.Integer, db.ForeignKey('venue.id'), nullable=False)
     start_time = db.Column(db.DateTime, nullable = False, server_default = db.func.now())
+    # copies of the artist and venue columns the show pages display, kept in
+    # step by fill_show() and copy_to_shows()
+    artist_name = db.Column(db.String, nullable = False)
     artist_image_link = db.Column(db.String)
+    venue_name = db.Column(db.String, nullable = False)
+    venue_city = db.Column(db.String, nullable = False)
+    venue_state = db.Column(db.String, nullable = False)
+    venue_image_link = db.Column(db.String)
+    # whether the show is counted in the past (not upcoming) shows of its venue and artist
+    counted_past = db.Column(db.Boolean, nullable = False, default = False, server_default = db.false())
+    # bumped on every write, see "Conditional requests"
+    version = db.Column(db.Integer, nullable = False, default = 1, server_default = '1')
+    updated_at = db.Column(db.DateTime, nullable = False, default = datetime.utcnow, server_default = db.func.now())
 
     def __repr__(self):
       return f'<artist_id={self.artist_id}, venue_id={self.venue_id}>'
 
+def touch(model):
+  # Values for bulk updates (Query.update, Core update) that rewrite rows
+  # past the ORM; flushed objects are bumped by bump_versions()
+  return {"version": model.version + 1, "updated_at": datetime.utcnow()}
+
+def get_genres(names):
+  # Returns the Genre rows for the given names, adding the missing ones to the session
+  names = list(dict.fromkeys(name.strip() for name in names if name.strip()))
+  if not names:
+    return []
+  genres = {genre.name: genre for genre in Genre.query.filter(Genre.name.in_(names))}
+  for name in names:
+    if name not in genres:
+      genres[name] = Genre(name = name)
+      db.session.add(genres[name])
+  return [genres[name] for name in names]
+
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+# Venues and artists carry their upcoming and past show counts. A new show is
+# counted when it is created, and rollover_shows() (`flask rollover-shows`,
+# run periodically) moves the shows that have started since from the
+# upcoming to the past counters. Counters are always moved with
+# `SET n = n + k`, never read and written back, so concurrent writers can't
+# lose updates.
+
+COUNTED_MODELS = ((Venue, 'venue_id'), (Artist, 'artist_id'))
+
+def count_show(show):
+  show.counted_past = show.start_time < datetime.now()
+  for model, key in COUNTED_MODELS:
+    counter = model.past_shows_count if show.counted_past else model.upcoming_shows_count
+    model.query.filter_by(id = getattr(show, key)).update(
+      dict(touch(model), **{counter.key: counter + 1}), synchronize_session = False)
+
+def rollover_shows(batch_size = 5000):
+  now = datetime.now()
+  total = 0
+  while True:
+    # SKIP LOCKED keeps two runs on Postgres from moving the same shows
+    rows = db.session.query(Show.id, Show.venue_id, Show.artist_id).filter(
+      db.not_(Show.counted_past), Show.start_time < now
+    ).order_by(Show.start_time).limit(batch_size).with_for_update(skip_locked = True).all()
+    if not rows:
+      return total
+    for model, key in COUNTED_MODELS:
+      moved = collections.Counter(getattr(row, key) for row in rows)
+      db.session.execute(
+        model.__table__.update().where(model.id == db.bindparam('entity_id')).values(
+          upcoming_shows_count = model.upcoming_shows_count - db.bindparam('moved'),
+          past_shows_count = model.past_shows_count + db.bindparam('moved'),
+          **touch(model)
+        ),
+        [{"entity_id": entity_id, "moved": count} for entity_id, count in moved.items()]
+      )
+    Show.query.filter(Show.id.in_([row.id for row in rows])).update(
+      {Show.counted_past: True}, synchronize_session = False)
+    db.session.commit()
+    total += len(rows)
+
+def recount_shows():
+  Show.query.update({Show.counted_past: Show.start_time < datetime.now()}, synchronize_session = False)
+  for model, key in COUNTED_MODELS:
+    def shows(past):
+      return db.session.query(db.func.count(Show.id)).filter(
+        getattr(Show, key) == model.id, Show.counted_past == past
+      ).correlate(model).as_scalar()
+    model.query.update(dict(
+      touch(model),
+      upcoming_shows_count = shows(False),
+      past_shows_count = shows(True)
+    ), synchronize_session = False)
+  db.session.commit()
+
+#----------------------------------------------------------------------------#
+# Show read model.
+#----------------------------------------------------------------------------#
+
+# Shows carry copies of the artist and venue columns that the show listings,
+# the timeline and the detail pages display, so those pages read the show
+# table alone. fill_show() copies them into a new show and copy_to_shows()
+# rewrites them on every show of an artist or venue that was edited.
+
+# model -> (foreign key column of show, {show column: model column})
+SHOW_COPIES = {
+  Artist: ('artist_id', {'artist_name': 'name', 'artist_image_link': 'image_link'}),
+  Venue: ('venue_id', {'venue_name': 'name', 'venue_city': 'city', 'venue_state': 'state', 'venue_image_link': 'image_link'}),
+}
+
+def fill_show(show):
+  for model, (key, columns) in SHOW_COPIES.items():
+    values = db.session.query(*[getattr(model, source) for source in columns.values()]).filter(
+      model.id == getattr(show, key)).first()
+    if values is None:
+      raise ValueError('No {} with id {}'.format(model.__tablename__, getattr(show, key)))
+    for column, value in zip(columns, values):
+      setattr(show, column, value)
+
+def copy_to_shows(entity):
+  # only the copied columns that actually changed, and only when one did
+  key, columns = SHOW_COPIES[type(entity)]
+  state = db.inspect(entity)
+  changed = {
+    column: getattr(entity, source)
+    for column, source in columns.items()
+    if state.attrs[source].history.has_changes()
+  }
+  if changed:
+    shows = Show.query.filter(getattr(Show, key) == entity.id)
+    shows.update(dict(touch(Show), **changed), synchronize_session = False)
+    # the detail pages of the other side of those shows display the copies
+    other, other_key = (Venue, 'venue_id') if key == 'artist_id' else (Artist, 'artist_id')
+    other.query.filter(other.id.in_(shows.with_entities(getattr(Show, other_key)))).update(
+      touch(other), synchronize_session = False)
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
+@functools.lru_cache(maxsize=None)
+def datetime_pattern(format, locale):
+  # parsing the CLDR pattern and the locale dominates a format call, do it once
+  import babel.dates
   if format == 'full':
       format="EEEE MMMM, d, y 'at' h:mma"
   elif format == 'medium':
       format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
+  return babel.dates.parse_pattern(format), babel.Locale.parse(locale)
+
+def format_datetime(value, format='medium', locale='en'):
+  if isinstance(value, str):
+    import dateutil.parser
+    value = dateutil.parser.parse(value)
+  pattern, locale = datetime_pattern(format, locale)
+  return pattern.apply(value, locale)
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+#----------------------------------------------------------------------------#
+# Assets.
+#----------------------------------------------------------------------------#
+
+# build_assets.py writes minified, fingerprinted bundles and a manifest to
+# static/dist; they are served from /assets with far-future cache headers.
+# Without a build the templates get the source files of each bundle instead.
+
+ASSETS_DIR = os.path.join(app.static_folder, 'dist')
+
+@functools.lru_cache(maxsize=1)
+def read_asset_manifest(path, mtime):
+  with open(path) as f:
+    return json.load(f)
+
+def asset_manifest():
+  path = os.path.join(ASSETS_DIR, 'manifest.json')
+  try:
+    # keyed by mtime, so a rebuild is picked up without a restart
+    return read_asset_manifest(path, os.path.getmtime(path))
+  except OSError:
+    return {}
+
+def asset_urls(name):
+  built = asset_manifest().get(name)
+  if built:
+    return [url_for('asset', filename = built)]
+  return [url_for('static', filename = source) for source in BUNDLES[name]]
+
+app.jinja_env.globals['asset_urls'] = asset_urls
+
+@app.route('/assets/<path:filename>')
+def asset(filename):
+  # NOTE: a proxy or CDN in front of the app should serve static/dist itself
+  mimetype = mimetypes.guess_type(filename)[0]
+  accepted = request.accept_encodings
+  for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+    if accepted[encoding] and os.path.isfile(os.path.join(ASSETS_DIR, filename + suffix)):
+      response = send_from_directory(ASSETS_DIR, filename + suffix, mimetype = mimetype)
+      response.headers['Content-Encoding'] = encoding
+      break
+  else:
+    response = send_from_directory(ASSETS_DIR, filename, mimetype = mimetype)
+  # the name changes whenever the content does
+  response.cache_control.public = True
+  response.cache_control.max_age = 365 * 24 * 3600
+  response.headers['Cache-Control'] += ', immutable'
+  response.vary.add('Accept-Encoding')
+  return response
+
+#----------------------------------------------------------------------------#
+# Pagination.
+#----------------------------------------------------------------------------#
+
+def encode_cursor(values):
+  raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+  return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor, keys):
+  try:
+    values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    if len(values) != len(keys):
+      raise ValueError(cursor)
+    return [
+      datetime.fromisoformat(v) if isinstance(key.type, db.DateTime) else v
+      for key, v in zip(keys, values)
+    ]
+  except (ValueError, TypeError):
+    abort(400, "Invalid cursor")
+
+def page_size():
+  limit = request.args.get('limit', app.config['PAGE_SIZE'], type=int)
+  return max(1, min(limit, app.config['MAX_PAGE_SIZE']))
+
+def keyset_page(query, keys):
+  # Keyset pagination: the page starts right after (or right before) the row
+  # encoded in the cursor, so the database walks the (keys) index instead of
+  # counting and skipping an OFFSET. Every key must be in the selected columns.
+  limit = page_size()
+  after = request.args.get('after')
+  before = request.args.get('before')
+  if before:
+    values = decode_cursor(before, keys)
+    query = query.filter(db.tuple_(*keys) < db.tuple_(*values)).order_by(*[k.desc() for k in keys])
+  else:
+    if after:
+      values = decode_cursor(after, keys)
+      query = query.filter(db.tuple_(*keys) > db.tuple_(*values))
+    query = query.order_by(*keys)
+
+  names = [k.key for k in keys]
+  page = {
+    "limit": limit,
+    "prev": None,
+    "next": None
+  }
+  def cursor(row):
+    return encode_cursor([getattr(row, n) for n in names])
+
+  query = query.limit(limit + 1)
+  if app.config['STREAM_LISTINGS'] and not before:
+    # rows are fetched from a server-side cursor while the page renders; the
+    # cursors are filled in as the rows go by, in time for the pager at the end
+    return stream_page(query.yield_per(app.config['STREAM_BATCH_SIZE']), page, cursor, bool(after)), page
+
+  rows = query.all()
+  has_more = len(rows) > limit
+  rows = rows[:limit]
+  if before:
+    rows.reverse()
+    has_prev, has_next = has_more, True
+  else:
+    has_prev, has_next = bool(after), has_more
+
+  if rows and has_prev:
+    page["prev"] = cursor(rows[0])
+  if rows and has_next:
+    page["next"] = cursor(rows[-1])
+  return rows, page
+
+def stream_page(rows, page, cursor, has_prev):
+  last = None
+  for count, row in enumerate(rows):
+    if count == 0 and has_prev:
+      page["prev"] = cursor(row)
+    if count == page["limit"]:
+      page["next"] = cursor(last)
+      break
+    last = row
+    yield row
+
+def render_listing(template_name, **context):
+  if not app.config['STREAM_LISTINGS']:
+    return render_template(template_name, **context)
+  app.update_template_context(context)
+  template = app.jinja_env.get_template(template_name)
+  return app.response_class(stream_with_context(template.generate(context)))
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+def escape_like(term):
+  return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def search_entities(model, search_term):
+  # Matches the term against name, city, state and genres. On Postgres the
+  # ILIKEs are served by the pg_trgm GIN indexes and results are ranked by
+  # trigram similarity of the name; other databases (SQLite in development)
+  # scan and rank prefix matches on the name first. Results are paged by
+  # keyset on (rank, name, id), and the total is counted separately up to
+  # SEARCH_COUNT_LIMIT, so neither grows with the number of matches.
+  search_term = search_term.strip()
+  if ',' in search_term:
+    # "San Francisco, CA" style searches
+    city, state = [part.strip() for part in search_term.split(',', 1)]
+    condition = db.and_(
+      model.city.ilike('%' + escape_like(city) + '%', escape='\\'),
+      model.state.ilike('%' + escape_like(state) + '%', escape='\\')
+    )
+  else:
+    pattern = '%' + escape_like(search_term) + '%'
+    condition = db.or_(*[
+      column.ilike(pattern, escape='\\')
+      for column in (model.name, model.city, model.state)
+    ] + [model.genres.any(Genre.name.ilike(pattern, escape='\\'))])
+
+  # lower ranks first
+  if db.engine.dialect.name == 'postgresql':
+    rank = (-db.func.similarity(model.name, search_term)).label('search_rank')
+  else:
+    rank = db.case([(model.name.ilike(escape_like(search_term) + '%', escape='\\'), 0)], else_ = 1).label('search_rank')
+
+  rows, page = keyset_page(
+    db.session.query(model.id, model.name, model.upcoming_shows_count, rank).filter(condition),
+    [rank, model.name, model.id])
+  page["args"] = {"search_term": search_term}
+  data = [
+    {
+      "id": q.id,
+      "name": q.name,
+      "num_upcoming_shows": q.upcoming_shows_count
+    }
+    for q in rows
+  ]
+
+  count_limit = app.config['SEARCH_COUNT_LIMIT']
+  if not (request.args.get('after') or request.args.get('before') or page["next"]):
+    # the first page holds every match
+    count = len(data)
+  else:
+    matches = db.session.query(model.id).filter(condition).limit(count_limit + 1).subquery()
+    count = db.session.query(db.func.count()).select_from(matches).scalar()
+  return {
+    "count": min(count, count_limit),
+    "count_capped": count > count_limit,
+    "data": data,
+    "page": page
+  }
+
+#----------------------------------------------------------------------------#
+# Cache.
+#----------------------------------------------------------------------------#
+
+cache = create_cache(app.config)
+
+def cached_page(view):
+  # Caches the rendered page by path and query string. Pages carrying flashed
+  # messages are per-user, so they are always rendered and never stored.
+  @functools.wraps(view)
+  def wrapper(*args, **kwargs):
+    if '_flashes' in session:
+      return view(*args, **kwargs)
+    # pages with a validator are cached per ETag, so a worker that missed an
+    # invalidation still can't answer with a page older than the validator
+    key = request.full_path + g.get('etag', '')
+    cached = cache.get(key)
+    if cached is not None:
+      body, status, headers = cached
+      response = app.response_class(body, status = status, headers = headers)
+      response.headers['X-Cache'] = 'HIT'
+      return response
+    generation = cache.generation
+    response = make_response(view(*args, **kwargs))
+    if response.status_code == 200 and not replica_may_lag():
+      if response.is_streamed:
+        response.response = cache_stream(key, response, response.response, generation)
+      else:
+        cache.set(key, (response.get_data(), response.status_code, list(response.headers)), generation)
+    response.headers['X-Cache'] = 'MISS'
+    return response
+  return wrapper
+
+def cache_stream(key, response, body, generation):
+  # passes the chunks through and stores the page once all of it was sent.
+  # Past CACHE_MAX_STREAM_BYTES the chunks are dropped and nothing is stored,
+  # so a long listing is never held in memory whole.
+  chunks = []
+  size = 0
+  limit = app.config['CACHE_MAX_STREAM_BYTES']
+  for chunk in body:
+    chunk = chunk.encode(response.charset) if isinstance(chunk, str) else chunk
+    if chunks is not None:
+      size += len(chunk)
+      if size > limit:
+        chunks = None
+      else:
+        chunks.append(chunk)
+    yield chunk
+  if chunks is not None:
+    cache.set(key, (b''.join(chunks), response.status_code, list(response.headers)), generation)
+
+CACHED_MODELS = (Venue, Artist, Show, Genre)
+pages_invalidated_at = 0
+
+@event.listens_for(db.session, 'after_flush')
+def track_cached_models(session, flush_context):
+  for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+    if isinstance(obj, CACHED_MODELS):
+      session.info['invalidate_pages'] = True
+      return
+
+@event.listens_for(db.session, 'after_bulk_delete')
+@event.listens_for(db.session, 'after_bulk_update')
+def track_bulk_writes(context):
+  context.session.info['invalidate_pages'] = True
+
+@event.listens_for(db.session, 'after_commit')
+def invalidate_pages(session):
+  global pages_invalidated_at
+  if session.info.pop('invalidate_pages', False):
+    cache.clear()
+    pages_invalidated_at = time.time()
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_invalidation(session):
+  session.info.pop('invalidate_pages', None)
+
+@app.route('/cache/stats')
+def cache_stats():
+  # cache keys and hit rates are for development only
+  if not app.debug:
+    abort(404)
+  return jsonify(cache.stats())
+
+#----------------------------------------------------------------------------#
+# Conditional requests.
+#----------------------------------------------------------------------------#
+
+# Venues, artists and shows carry a version, bumped on every write to the
+# row, and the time of that write. Detail and listing pages derive their
+# ETag and Last-Modified from them with one small query, and answer a
+# matching conditional GET with 304 before loading or rendering anything
+# else. The release's asset manifest is part of every ETag, since the pages
+# link the fingerprinted bundles.
+
+VERSIONED_MODELS = (Venue, Artist, Show)
+
+@event.listens_for(db.session, 'before_flush')
+def bump_versions(session, flush_context, instances):
+  for obj in session.dirty:
+    if isinstance(obj, VERSIONED_MODELS) and session.is_modified(obj):
+      obj.version = type(obj).version + 1
+      obj.updated_at = datetime.utcnow()
+
+def last_started_show(key, model):
+  # The detail pages split past from upcoming shows by the local clock, so
+  # they also change whenever one of their shows starts. NOTE: start times
+  # are local, updated_at is UTC; Last-Modified takes the later of the two.
+  return db.session.query(db.func.max(Show.start_time)).filter(
+    key == model.id, Show.start_time < datetime.now()
+  ).correlate(model).as_scalar()
+
+def conditional(validator):
+  # validator(*args, **kwargs) of the view returns a row identifying the
+  # current state of the page, Last-Modified is its latest datetime; None
+  # leaves the answer to the view (e.g. a 404)
+  def decorator(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+      # flashed messages make the page per-user
+      if '_flashes' in session:
+        return view(*args, **kwargs)
+      row = read_only(validator)(*args, **kwargs)
+      if row is None:
+        return view(*args, **kwargs)
+      etag = hashlib.md5(repr((tuple(row), sorted(asset_manifest().items()))).encode()).hexdigest()
+      dates = [value for value in row if isinstance(value, datetime)]
+      last_modified = max(dates).replace(microsecond = 0) if dates else None
+      g.etag = etag
+
+      if request.if_none_match:
+        not_modified = request.if_none_match.contains_weak(etag)
+      else:
+        not_modified = None not in (last_modified, request.if_modified_since) and \
+          request.if_modified_since.replace(tzinfo = None) >= last_modified
+      response = app.response_class(status = 304) if not_modified else make_response(view(*args, **kwargs))
+      if response.status_code in (200, 304):
+        response.set_etag(etag, weak = True)
+        response.last_modified = last_modified
+        # kept by browsers, but revalidated before every use
+        response.cache_control.no_cache = True
+      return response
+    return wrapper
+  return decorator
+
+def venue_validator(venue_id):
+  return db.session.query(Venue.version, Venue.updated_at, last_started_show(Show.venue_id, Venue)).filter(
+    Venue.id == venue_id).first()
+
+def artist_validator(artist_id):
+  return db.session.query(Artist.version, Artist.updated_at, last_started_show(Show.artist_id, Artist)).filter(
+    Artist.id == artist_id).first()
+
+# The listings validate on the latest write to their table, through the
+# updated_at indexes. Venues can be deleted, so their count is part of it.
+
+def venues_validator(genre_name = None, state = None, city = None):
+  return db.session.query(db.func.count(Venue.id), db.func.max(Venue.updated_at)).one()
+
+def artists_validator(genre_name = None):
+  return db.session.query(db.func.max(Artist.updated_at)).one()
+
+def shows_validator():
+  return db.session.query(db.func.max(Show.updated_at)).one()
+
+def timeline_validator(city = None):
+  # The timelines start today by default and drop shows once they start, so
+  # they also change with the date and the last show to start.
+  started = db.session.query(db.func.max(Show.start_time)).filter(Show.start_time < datetime.now()).as_scalar()
+  return tuple(db.session.query(db.func.max(Show.updated_at), started).one()) + (datetime.now().date(),)
+
+#----------------------------------------------------------------------------#
+# Profiling.
+#----------------------------------------------------------------------------#
+
+# Every request records its query count, time spent in the database and in
+# templates, and its slowest statements. The totals are sent back in a
+# Server-Timing header and requests slower than SLOW_REQUEST_MS are appended
+# to the SLOW_REQUEST_LOG as one JSON object per line.
+
+slow_log = logging.getLogger('fyyur.slow_requests')
+slow_log.propagate = False
+if app.config.get('SLOW_REQUEST_LOG'):
+  slow_log_handler = FileHandler(app.config['SLOW_REQUEST_LOG'], delay = True)
+  slow_log_handler.setFormatter(Formatter('%(message)s'))
+  slow_log.addHandler(slow_log_handler)
+  slow_log.setLevel(logging.INFO)
+
+def request_profile():
+  if has_request_context():
+    return g.get('profile')
+  # fan_out workers record into the profile of the request they serve
+  return getattr(fan_out_state, 'profile', None)
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+  conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+  elapsed = time.perf_counter() - conn.info['query_started'].pop()
+  profile = request_profile()
+  if profile is None:
+    return
+  profile["queries"] += 1
+  profile["db"] += elapsed
+  # only the statement text is kept, parameters may hold user data
+  slowest = profile["slowest"]
+  if len(slowest) < app.config['SLOW_REQUEST_STATEMENTS']:
+    heapq.heappush(slowest, (elapsed, statement))
+  elif elapsed > slowest[0][0]:
+    heapq.heapreplace(slowest, (elapsed, statement))
+
+@event.listens_for(Engine, 'handle_error')
+def discard_query_timer(context):
+  # a failed statement never reaches after_cursor_execute, so its start time
+  # would stay on the connection after it goes back to the pool
+  if context.connection is not None:
+    context.connection.info.pop('query_started', None)
+
+@before_render_template.connect_via(app)
+def start_render_timer(sender, template, context, **extra):
+  profile = request_profile()
+  if profile is not None:
+    profile["render_started"] = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def stop_render_timer(sender, template, context, **extra):
+  profile = request_profile()
+  if profile is not None and profile.get("render_started"):
+    profile["render"] += time.perf_counter() - profile.pop("render_started")
+
+@app.before_request
+def start_profile():
+  if app.config['PROFILE_REQUESTS']:
+    g.profile = {"started": time.perf_counter(), "queries": 0, "db": 0.0, "render": 0.0, "slowest": []}
+
+@app.after_request
+def add_server_timing(response):
+  # NOTE: streamed pages are still being rendered at this point, their
+  # header only covers the work done before the first chunk
+  profile = request_profile()
+  if profile is not None:
+    response.headers['Server-Timing'] = 'db;dur={:.1f};desc="{} queries", render;dur={:.1f}, total;dur={:.1f}'.format(
+      profile["db"] * 1000, profile["queries"], profile["render"] * 1000,
+      (time.perf_counter() - profile["started"]) * 1000
+    )
+    profile["status"] = response.status_code
+  return response
+
+@app.teardown_request
+def log_slow_request(error = None):
+  # runs once the whole response, streamed or not, has been sent
+  profile = request_profile()
+  if profile is None or not slow_log.handlers:
+    return
+  duration = (time.perf_counter() - profile["started"]) * 1000
+  if duration < app.config['SLOW_REQUEST_MS']:
+    return
+  slow_log.info(json.dumps({
+    "time": datetime.utcnow().isoformat(),
+    "method": request.method,
+    "path": request.full_path.rstrip('?'),
+    "endpoint": request.endpoint,
+    "status": profile.get("status", 500),
+    "duration_ms": round(duration, 1),
+    "queries": profile["queries"],
+    "db_ms": round(profile["db"] * 1000, 1),
+    "render_ms": round(profile["render"] * 1000, 1),
+    "slowest": [
+      {"ms": round(elapsed * 1000, 1), "statement": statement}
+      for elapsed, statement in sorted(profile["slowest"], reverse = True)
+    ]
+  }))
+
+#----------------------------------------------------------------------------#
+# Metrics.
+#----------------------------------------------------------------------------#
+
+def metric_gauges():
+  gauges = {}
+  pool = db.engine.pool
+  if hasattr(pool, 'checkedout'):
+    gauges[('fyyur_db_pool_size', ())] = pool.size()
+    gauges[('fyyur_db_pool_checked_out', ())] = pool.checkedout()
+    gauges[('fyyur_db_pool_overflow', ())] = pool.overflow()
+  entries = cache.stats().get('entries')
+  if entries is not None:
+    gauges[('fyyur_page_cache_entries', ())] = entries
+  return gauges
+
+metrics = Registry(app.config['METRICS_DIR'], app.config['METRICS_FLUSH_INTERVAL'], gauges = metric_gauges)
+metrics.describe('fyyur_requests_total', 'counter', 'Requests by endpoint, method and status.')
+metrics.describe('fyyur_request_duration_seconds', 'histogram', 'Time to send the whole response, by endpoint.')
+metrics.describe('fyyur_db_duration_seconds', 'histogram', 'Time spent in database calls per request, by endpoint.')
+metrics.describe('fyyur_render_duration_seconds', 'histogram', 'Time spent rendering templates per request, by endpoint.')
+metrics.describe('fyyur_db_queries_total', 'counter', 'Statements executed, by endpoint.')
+metrics.describe('fyyur_page_cache_requests_total', 'counter', 'Page cache lookups by result (hit or miss).')
+metrics.describe('fyyur_db_pool_size', 'gauge', 'Connections kept by the pool.')
+metrics.describe('fyyur_db_pool_checked_out', 'gauge', 'Connections currently checked out of the pool.')
+metrics.describe('fyyur_db_pool_overflow', 'gauge', 'Connections opened beyond the pool size.')
+metrics.describe('fyyur_page_cache_entries', 'gauge', 'Pages held by the in-process cache.')
+
+@app.before_request
+def start_request_timer():
+  g.request_started = time.perf_counter()
+
+@app.after_request
+def count_cache_result(response):
+  g.response_status = response.status_code
+  if 'X-Cache' in response.headers:
+    metrics.inc('fyyur_page_cache_requests_total', (('result', response.headers['X-Cache'].lower()),))
+  return response
+
+@app.teardown_request
+def record_request_metrics(error = None):
+  if 'request_started' not in g:
+    return
+  endpoint = (('endpoint', request.endpoint or 'unmatched'),)
+  status = g.get('response_status', 500)
+  metrics.inc('fyyur_requests_total', endpoint + (('method', request.method), ('status', status)))
+  metrics.observe('fyyur_request_duration_seconds', endpoint, time.perf_counter() - g.request_started)
+  profile = request_profile()
+  if profile is not None:
+    metrics.inc('fyyur_db_queries_total', endpoint, profile["queries"])
+    metrics.observe('fyyur_db_duration_seconds', endpoint, profile["db"])
+    metrics.observe('fyyur_render_duration_seconds', endpoint, profile["render"])
+  metrics.maybe_flush()
+
+@app.route('/metrics')
+def metrics_endpoint():
+  return app.response_class(metrics.render(), mimetype = 'text/plain; version=0.0.4')
+
+#----------------------------------------------------------------------------#
+# Read replicas.
+#----------------------------------------------------------------------------#
+
+# Replicas are the SQLALCHEMY_BINDS whose key starts with 'replica' (config.py
+# builds them from DATABASE_REPLICA_URLS). A client that just wrote something
+# reads from the primary for REPLICA_STICKY_SECONDS, so the page it is
+# redirected to already shows its change even if the replicas lag behind.
+
+def replica_binds():
+  return sorted(key for key in app.config['SQLALCHEMY_BINDS'] or () if key.startswith('replica'))
+
+def read_only(view):
+  @functools.wraps(view)
+  def wrapper(*args, **kwargs):
+    binds = replica_binds()
+    if binds and session.get('primary_until', 0) < time.time():
+      g.replica_bind = random.choice(binds)
+    return view(*args, **kwargs)
+  return wrapper
+
+def replica_may_lag():
+  # A page read from a replica right after a write may not show it yet; it
+  # is still served, but not cached. NOTE: only writes made by this process
+  # are known here.
+  return g.get('replica_bind') is not None and time.time() - pages_invalidated_at < app.config['REPLICA_STICKY_SECONDS']
+
+@event.listens_for(db.session, 'after_commit')
+def stick_to_primary(db_session):
+  if has_request_context() and replica_binds():
+    session['primary_until'] = time.time() + app.config['REPLICA_STICKY_SECONDS']
+
+#----------------------------------------------------------------------------#
+# Query fan-out.
+#----------------------------------------------------------------------------#
+
+# With PARALLEL_DETAIL_QUERIES the detail pages send their independent
+# queries (entity, genres, shows) at the same time, each on its own pooled
+# connection of the engine the request reads from, so the page waits for the
+# slowest query instead of the sum of all three. NOTE: the queries don't
+# share a transaction, and every detail request holds up to three
+# connections; size the pool for it.
+
+fan_out_executor = ThreadPoolExecutor(app.config['FAN_OUT_WORKERS'], thread_name_prefix = 'fan-out')
+fan_out_state = threading.local()
+
+def fetch_all(engine, statement, profile):
+  fan_out_state.profile = profile
+  try:
+    with engine.connect() as connection:
+      return connection.execute(statement).fetchall()
+  finally:
+    fan_out_state.profile = None
+
+def fan_out(*queries):
+  engine = db.session.get_bind()
+  profile = request_profile()
+  futures = [fan_out_executor.submit(fetch_all, engine, query.statement, profile) for query in queries]
+  return [future.result() for future in futures]
+
+#----------------------------------------------------------------------------#
+# Autocomplete.
+#----------------------------------------------------------------------------#
+
+# Name prefix lookups for the search boxes, answered from an in-process
+# index (see autocomplete.py) instead of a LIKE scan per keystroke. Venues
+# and artists created, renamed or deleted through the session are applied to
+# the index once their transaction commits; bulk deletes need
+# synchronize_session='fetch' for their ids to be known.
+
+AUTOCOMPLETE_MODELS = {Venue: 'venue', Artist: 'artist'}
+
+def load_autocomplete_names():
+  # through a connection of its own, it also runs outside requests
+  names = []
+  with db.engine.connect() as connection:
+    for model, kind in AUTOCOMPLETE_MODELS.items():
+      rows = connection.execute(db.select([model.id, model.name]))
+      names.extend((kind, entity_id, name) for entity_id, name in rows)
+  return names
+
+name_index = Autocomplete(load_autocomplete_names, app.config['AUTOCOMPLETE_REFRESH'])
+
+@event.listens_for(db.session, 'after_flush')
+def track_autocomplete_names(session, flush_context):
+  changes = session.info.setdefault('autocomplete', [])
+  for obj in session.new:
+    if type(obj) in AUTOCOMPLETE_MODELS:
+      changes.append(('add', AUTOCOMPLETE_MODELS[type(obj)], obj.id, obj.name))
+  for obj in session.dirty:
+    if type(obj) in AUTOCOMPLETE_MODELS and db.inspect(obj).attrs.name.history.has_changes():
+      changes.append(('replace', AUTOCOMPLETE_MODELS[type(obj)], obj.id, obj.name))
+  for obj in session.deleted:
+    if type(obj) in AUTOCOMPLETE_MODELS:
+      changes.append(('remove', AUTOCOMPLETE_MODELS[type(obj)], obj.id, None))
+
+@event.listens_for(db.session, 'after_bulk_delete')
+def track_autocomplete_deletes(context):
+  kind = AUTOCOMPLETE_MODELS.get(context.mapper.class_)
+  if kind is None:
+    return
+  ids = [row[0] for row in getattr(context, 'matched_rows', None) or []]
+  ids += [obj.id for obj in getattr(context, 'matched_objects', None) or []]
+  context.session.info.setdefault('autocomplete', []).extend(('remove', kind, entity_id, None) for entity_id in ids)
+
+@event.listens_for(db.session, 'after_commit')
+def apply_autocomplete_names(session):
+  changes = session.info.pop('autocomplete', None)
+  if changes:
+    name_index.apply(changes)
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_autocomplete_names(session):
+  session.info.pop('autocomplete', None)
+
+@app.route('/autocomplete')
+def autocomplete():
+  term = request.args.get('q', '').strip()
+  kind = request.args.get('type')
+  if kind is not None and kind not in AUTOCOMPLETE_MODELS.values():
+    return api_error(400, "type must be venue or artist")
+  limit = min(max(1, request.args.get('limit', app.config['AUTOCOMPLETE_LIMIT'], type=int)),
+    app.config['AUTOCOMPLETE_MAX_LIMIT'])
+  matches = name_index.index().search(term, limit, kind) if term else []
+  return api_response({"data": [{"type": match[0], "id": match[1], "name": match[2]} for match in matches]})
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
@@ -106,69 +1015,150 @@ def index():
 #  Venues
 #  ----------------------------------------------------------------
 
+def venue_areas_query(*criteria):
+  # One row per (city, state) area with its first VENUES_PER_AREA venues
+  # aggregated into a JSON array, so a page holds at most that many venues
+  # per area; venue_count is the number of venues in the area.
+  # num_upcoming_shows is the venue's show counter.
+  area = [Venue.city, Venue.state]
+  rows = db.session.query(
+    Venue.id, Venue.name, Venue.city, Venue.state, Venue.upcoming_shows_count.label('num_upcoming_shows'),
+    db.func.row_number().over(partition_by = area, order_by = Venue.id).label('area_rank'),
+    db.func.count().over(partition_by = area).label('venue_count')
+  ).filter(*criteria).subquery('venue_rows')
+
+  venue = ('id', rows.c.id, 'name', rows.c.name, 'num_upcoming_shows', rows.c.num_upcoming_shows)
+  if db.engine.dialect.name == 'postgresql':
+    venues = db.func.json_agg(aggregate_order_by(db.func.json_build_object(*venue), rows.c.id))
+  else:
+    venues = db.func.json_group_array(db.func.json_object(*venue))
+  query = db.session.query(
+    rows.c.city, rows.c.state, venues.label('venues'), db.func.max(rows.c.venue_count).label('venue_count')
+  ).filter(rows.c.area_rank <= app.config['VENUES_PER_AREA']).group_by(rows.c.city, rows.c.state)
+  return query, [rows.c.city, rows.c.state]
+
+def venue_areas(rows):
+  for q in rows:
+    venues = q.venues
+    if isinstance(venues, str):
+      # SQLite returns the aggregate as unordered JSON text, psycopg2 decodes
+      # the ordered json_agg already
+      venues = sorted(json.loads(venues), key=lambda venue: venue["id"])
+    yield {
+      "city": q.city,
+      "state": q.state,
+      "venues": venues,
+      "venue_count": q.venue_count
+    }
+
 @app.route('/venues')
+@conditional(venues_validator)
+@cached_page
+@read_only
 def venues():
-  query = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state).all()
-  reg = {}
-  for q in query:
-    key = (q.city, q.state)
-    if not key in reg:
-      reg[key] = []
-    reg[key].append({
-      "id": str(q.id),
-      "name": str(q.name)
-    })
-  data = [{"city": key[0], "state": key[1], "venues": reg[key]} for key in reg]
-  # NOTE: num_upcoming_shows is not being used in pages/venues.html, so no need to include it, I guess
-  return render_template('pages/venues.html', areas = data)
-
-@app.route('/venues/search', methods=['POST'])
-def search_venues():
-  search_term = request.form.get('search_term', '')
-  query = Venue.query.filter(Venue.name.ilike("%" + search_term + "%")).all()
-  response = {
-    "count": len(query),
-    "data": [
-      {
-        "id": q.id,
-        "name": q.name
-      }
-      for q in query
-    ]
+  query, keys = venue_areas_query()
+  rows, page = keyset_page(query, keys)
+  return render_listing('pages/venues.html', areas = venue_areas(rows), page = page)
+
+@app.route('/venues/genres/<genre_name>')
+@conditional(venues_validator)
+@cached_page
+@read_only
+def venues_by_genre(genre_name):
+  genre = Genre.query.filter_by(name = genre_name).first()
+  if genre is None:
+    return abort(404)
+  query, keys = venue_areas_query(Venue.genres.any(Genre.id == genre.id))
+  rows, page = keyset_page(query, keys)
+  return render_listing('pages/venues.html', areas = venue_areas(rows), page = page, genre = genre)
+
+def area_venues_query(*criteria):
+  return db.session.query(Venue.id, Venue.name, Venue.upcoming_shows_count.label('num_upcoming_shows')).filter(*criteria)
+
+@app.route('/venues/areas/<state>/<city>')
+@conditional(venues_validator)
+@cached_page
+@read_only
+def venues_in_area(state, city):
+  # every venue of one area, paged by id through ix_venue_city_state; the
+  # "more" link of an area on the listings above
+  criteria = [Venue.city == city, Venue.state == state]
+  genre = None
+  genre_name = request.args.get('genre')
+  if genre_name:
+    genre = Genre.query.filter_by(name = genre_name).first()
+    if genre is None:
+      return abort(404)
+    criteria.append(Venue.genres.any(Genre.id == genre.id))
+  rows, page = keyset_page(area_venues_query(*criteria), [Venue.id])
+  if genre:
+    page["args"] = {"genre": genre.name}
+  area = {
+    "city": city,
+    "state": state,
+    "venues": rows
   }
+  return render_listing('pages/venues.html', areas = [area], page = page, genre = genre)
+
+@app.route('/venues/search', methods=['GET', 'POST'])
+@read_only
+def search_venues():
+  search_term = request.values.get('search_term', '')
+  response = search_entities(Venue, search_term)
   # NOTE: num_upcoming_shows is not being used in pages/search_venues.html, so no need to include it, I guess
-  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+  return render_template('pages/search_venues.html', results=response, search_term=search_term, page=response["page"])
+
+def venue_shows_query(venue_id):
+  # NOTE: every show of the venue comes back in this one query, with the artist
+  # columns copied on the show. Past and upcoming are split by the app's local
+  # clock, the same one the show counters roll over by.
+  return db.session.query(
+    Show.artist_id,
+    Show.artist_name,
+    Show.artist_image_link,
+    Show.start_time,
+    (Show.start_time < datetime.now()).label('is_past')
+  ).filter(Show.venue_id == venue_id).order_by(Show.start_time)
+
+def venue_genres_query(venue_id):
+  return db.session.query(Genre.name).join(venue_genres, venue_genres.c.genre_id == Genre.id).filter(
+    venue_genres.c.venue_id == venue_id).order_by(Genre.name)
 
 def filter_shows_for_venues(shows):
   past_shows = []
   upcoming_shows = []
   for show in shows:
-    artist_data = Artist.query.filter_by(id = show.artist_id).first()
     show_d = {
       "artist_id": show.artist_id,
-      "artist_name": artist_data.name,
-      "artist_image_link": artist_data.image_link,
-      "start_time": show.start_time.strftime("%a, %d %b %Y %H:%M:%S +0000")
+      "artist_name": show.artist_name,
+      "artist_image_link": show.artist_image_link,
+      "start_time": show.start_time
     }
-    if show.start_time < datetime.now():
+    if show.is_past:
       past_shows.append(show_d)
     else:
       upcoming_shows.append(show_d)
   return past_shows, upcoming_shows
 
-@app.route('/venues/<int:venue_id>')
-def show_venue(venue_id):
-  query = Venue.query.filter_by(id = venue_id).first()
+def venue_detail(venue_id):
+  if app.config['PARALLEL_DETAIL_QUERIES']:
+    venues, genres, shows = fan_out(
+      Venue.query.filter_by(id = venue_id), venue_genres_query(venue_id), venue_shows_query(venue_id))
+    query = venues[0] if venues else None
+  else:
+    query = Venue.query.filter_by(id = venue_id).first()
+    genres = query.genres if query is not None else []
+    shows = venue_shows_query(venue_id)
 
   if query is None:
-    return abort(404)
+    return None
 
-  past_shows, upcoming_shows = filter_shows_for_venues(query.shows)
+  past_shows, upcoming_shows = filter_shows_for_venues(shows)
 
   data = {
     "id": query.id,
     "name": query.name,
-    "genres": query.genres.split(","),
+    "genres": [genre.name for genre in genres],
     "address": query.address,
     "city": query.city,
     "state": query.state,
@@ -183,6 +1173,16 @@ def show_venue(venue_id):
     "past_shows_count": len(past_shows),
     "upcoming_shows_count": len(upcoming_shows)
   }
+  return data
+
+@app.route('/venues/<int:venue_id>')
+@conditional(venue_validator)
+@cached_page
+@read_only
+def show_venue(venue_id):
+  data = venue_detail(venue_id)
+  if data is None:
+    return abort(404)
   return render_template('pages/show_venue.html', venue = data)
 
 #  Create Venue
@@ -204,7 +1204,7 @@ def create_venue_submission():
       state = data.state.data,
       address = data.address.data,
       phone = data.phone.data,
-      genres = ','.join(data.genres.data),
+      genres = get_genres(data.genres.data),
       facebook_link = data.facebook_link.data,
       image_link = data.image_link.data,
       website = data.website_link.data,
@@ -213,8 +1213,8 @@ def create_venue_submission():
     )
     db.session.add(venue)
     db.session.commit()
-  except exc.SQLAlchemyError as error:
-    print(error)
+  except exc.SQLAlchemyError:
+    app.logger.exception('Could not create venue')
     if error_message is None:
       error_message = "Something went wrong, please try again."
     db.session.rollback()
@@ -230,15 +1230,11 @@ def create_venue_submission():
 def delete_venue(venue_id):
   error = False
   try:
-    Venue.query.filter_by(id=venue_id).delete()
+    Venue.query.filter_by(id=venue_id).delete(synchronize_session = 'fetch')
     db.session.commit()
   except exc.SQLAlchemyError as excError:
-    print(excError)
+    app.logger.exception('Could not delete venue %s', venue_id)
     error = str(excError.__dict__['orig'])
-    print()
-    print("JOGALLAR")
-    print(error)
-    print()
     db.session.rollback()
   finally:
     if error:
@@ -248,60 +1244,92 @@ def delete_venue(venue_id):
 
 #  Artists
 #  ----------------------------------------------------------------
+ARTIST_KEYS = [Artist.name, Artist.id]
+
+def artists_query():
+  return db.session.query(Artist.id, Artist.name)
+
 @app.route('/artists')
+@conditional(artists_validator)
+@cached_page
+@read_only
 def artists():
-  query = db.session.query(Artist.id, Artist.name).all()
-  data = [{"id": q.id, "name": q.name} for q in query]
-  return render_template('pages/artists.html', artists = data)
+  rows, page = keyset_page(artists_query(), ARTIST_KEYS)
+  data = ({"id": q.id, "name": q.name} for q in rows)
+  return render_listing('pages/artists.html', artists = data, page = page)
+
+@app.route('/artists/genres/<genre_name>')
+@conditional(artists_validator)
+@cached_page
+@read_only
+def artists_by_genre(genre_name):
+  genre = Genre.query.filter_by(name = genre_name).first()
+  if genre is None:
+    return abort(404)
+  query = artists_query().join(
+    artist_genres, artist_genres.c.artist_id == Artist.id
+  ).filter(artist_genres.c.genre_id == genre.id)
+  rows, page = keyset_page(query, ARTIST_KEYS)
+  data = ({"id": q.id, "name": q.name} for q in rows)
+  return render_listing('pages/artists.html', artists = data, page = page, genre = genre)
 
-@app.route('/artists/search', methods=['POST'])
+@app.route('/artists/search', methods=['GET', 'POST'])
+@read_only
 def search_artists():
-  search_term = request.form.get('search_term', '')
-  query = Artist.query.filter(Artist.name.ilike("%" + search_term + "%")).all()
-  response = {
-    "count": len(query),
-    "data": [
-      {
-        "id": q.id,
-        "name": q.name
-      }
-      for q in query
-    ]
-  }
+  search_term = request.values.get('search_term', '')
+  response = search_entities(Artist, search_term)
   # NOTE: num_upcoming_shows is not being used in pages/search_artists.html, so no need to include it, I guess
-  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+  return render_template('pages/search_artists.html', results=response, search_term=search_term, page=response["page"])
+
 
+def artist_shows_query(artist_id):
+  return db.session.query(
+    Show.venue_id,
+    Show.venue_name,
+    Show.venue_image_link,
+    Show.start_time,
+    (Show.start_time < datetime.now()).label('is_past')
+  ).filter(Show.artist_id == artist_id).order_by(Show.start_time)
+
+def artist_genres_query(artist_id):
+  return db.session.query(Genre.name).join(artist_genres, artist_genres.c.genre_id == Genre.id).filter(
+    artist_genres.c.artist_id == artist_id).order_by(Genre.name)
 
 def filter_shows_for_artists(shows):
   past_shows = []
   upcoming_shows = []
   for show in shows:
-    venue_data = Venue.query.filter_by(id = show.venue_id).first()
     show_d = {
       "venue_id": show.venue_id,
-      "venue_name": venue_data.name,
-      "venue_image_link": venue_data.image_link,
-      "start_time": show.start_time.strftime("%a, %d %b %Y %H:%M:%S +0000")
+      "venue_name": show.venue_name,
+      "venue_image_link": show.venue_image_link,
+      "start_time": show.start_time
     }
-    if show.start_time < datetime.now():
+    if show.is_past:
       past_shows.append(show_d)
     else:
       upcoming_shows.append(show_d)
   return past_shows, upcoming_shows
 
-@app.route('/artists/<int:artist_id>')
-def show_artist(artist_id):
-  query = Artist.query.filter_by(id = artist_id).first()
+def artist_detail(artist_id):
+  if app.config['PARALLEL_DETAIL_QUERIES']:
+    artists, genres, shows = fan_out(
+      Artist.query.filter_by(id = artist_id), artist_genres_query(artist_id), artist_shows_query(artist_id))
+    query = artists[0] if artists else None
+  else:
+    query = Artist.query.filter_by(id = artist_id).first()
+    genres = query.genres if query is not None else []
+    shows = artist_shows_query(artist_id)
 
   if query is None:
-    return abort(404)
+    return None
 
-  past_shows, upcoming_shows = filter_shows_for_artists(query.shows)
+  past_shows, upcoming_shows = filter_shows_for_artists(shows)
 
   data = {
     "id": query.id,
     "name": query.name,
-    "genres": query.genres.split(","),
+    "genres": [genre.name for genre in genres],
     "city": query.city,
     "state": query.state,
     "phone": query.phone,
@@ -315,7 +1343,16 @@ def show_artist(artist_id):
     "past_shows_count": len(past_shows),
     "upcoming_shows_count": len(upcoming_shows)
   }
+  return data
 
+@app.route('/artists/<int:artist_id>')
+@conditional(artist_validator)
+@cached_page
+@read_only
+def show_artist(artist_id):
+  data = artist_detail(artist_id)
+  if data is None:
+    return abort(404)
   return render_template('pages/show_artist.html', artist=data)
 
 #  Update
@@ -325,19 +1362,8 @@ def edit_artist(artist_id):
   query = Artist.query.filter_by(id = artist_id).first()
   if query is None:
     return abort(404)
-  form = ArtistForm(formdata = None, data = {
-    'id': query.id,
-    'name': query.name,
-    'genres': query.genres.split(','),
-    'city': query.city,
-    'state': query.state,
-    'phone': query.phone,
-    'website': query.website,
-    'facebook_link': query.facebook_link,
-    'seeking_venue': query.seeking_venue,
-    'seeking_description': query.seeking_description,
-    'image_link': query.image_link
-  })
+  form = ArtistForm(formdata = None, obj = query)
+  form.genres.data = [genre.name for genre in query.genres]
   return render_template('forms/edit_artist.html', form=form, artist=query)
 
 @app.route('/artists/<int:artist_id>/edit', methods=['POST'])
@@ -346,12 +1372,14 @@ def edit_artist_submission(artist_id):
   if query is None:
       abort(404)
   form = ArtistForm(request.form)
-  form.genres.data = ', '.join(form.genres.data)
+  query.genres = get_genres(form.genres.data)
+  del form.genres
   if "seeking_venue" in request.form:
       form.seeking_venue.data = True
   else:
       form.seeking_venue.data = False
   form.populate_obj(query)
+  copy_to_shows(query)
   db.session.commit()
 
   return redirect(url_for('show_artist', artist_id=artist_id))
@@ -362,20 +1390,8 @@ def edit_venue(venue_id):
   query = Venue.query.filter_by(id = venue_id).first()
   if query is None:
     return abort(404)
-  form = VenueForm(formdata = None, data = {
-    'id': query.id,
-    'name': query.name,
-    'genres': query.genres.split(','),
-    "address": query.address,
-    'city': query.city,
-    'state': query.state,
-    'phone': query.phone,
-    'website': query.website,
-    'facebook_link': query.facebook_link,
-    'seeking_talent': query.seeking_talent,
-    'seeking_description': query.seeking_description,
-    'image_link': query.image_link
-  })
+  form = VenueForm(formdata = None, obj = query)
+  form.genres.data = [genre.name for genre in query.genres]
   return render_template('forms/edit_venue.html', form = form, venue = query)
 
 @app.route('/venues/<int:venue_id>/edit', methods=['POST'])
@@ -384,8 +1400,10 @@ def edit_venue_submission(venue_id):
   if query is None:
         abort(404)
   form = VenueForm(request.form)
-  form.genres.data = ', '.join(form.genres.data)
+  query.genres = get_genres(form.genres.data)
+  del form.genres
   form.populate_obj(query)
+  copy_to_shows(query)
   db.session.commit()
   return redirect(url_for('show_venue', venue_id=venue_id))
 
@@ -411,7 +1429,7 @@ def create_artist_submission():
       city = data.city.data,
       state = data.state.data,
       phone = data.phone.data,
-      genres = ','.join(data.genres.data),
+      genres = get_genres(data.genres.data),
       facebook_link = data.facebook_link.data,
       image_link = data.image_link.data,
       website = data.website_link.data,
@@ -420,8 +1438,8 @@ def create_artist_submission():
     )
     db.session.add(artist)
     db.session.commit()
-  except exc.SQLAlchemyError as error:
-    print(error)
+  except exc.SQLAlchemyError:
+    app.logger.exception('Could not create artist')
     if error_message is None:
       error_message = "Something went wrong, please try again."
     db.session.rollback()
@@ -437,21 +1455,115 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 
+SHOW_KEYS = [Show.start_time, Show.id]
+
+def shows_query():
+  return db.session.query(
+    Show.id,
+    Show.venue_id,
+    Show.venue_name,
+    Show.artist_id,
+    Show.artist_name,
+    Show.artist_image_link,
+    Show.start_time
+  )
+
+def show_item(show):
+  return {
+    "venue_id": show.venue_id,
+    "venue_name": show.venue_name,
+    "artist_id": show.artist_id,
+    "artist_name": show.artist_name,
+    "artist_image_link": show.artist_image_link,
+    "start_time": show.start_time
+  }
+
 @app.route('/shows')
+@conditional(shows_validator)
+@cached_page
+@read_only
 def shows():
-  query = db.session.query(Show, Artist, Venue).select_from(Show).join(Artist).join(Venue).all()
-  data = [
+  rows, page = keyset_page(shows_query(), SHOW_KEYS)
+  data = (show_item(show) for show in rows)
+  return render_listing('pages/shows.html', shows=data, page=page)
+
+#  Timeline
+#  ----------------------------------------------------------------
+TIMELINE_BUCKETS = ('day', 'week')
+
+def show_bucket(bucket):
+  # start of the show's day or week (weeks start on Monday), computed by the database
+  if db.engine.dialect.name == 'postgresql':
+    return db.func.date_trunc(bucket, Show.start_time)
+  if bucket == 'week':
+    return db.func.date(Show.start_time, 'weekday 0', '-6 days')
+  return db.func.date(Show.start_time)
+
+def date_arg(name, default):
+  value = request.args.get(name)
+  if not value:
+    return default
+  try:
+    return datetime.strptime(value, '%Y-%m-%d')
+  except ValueError:
+    abort(400)
+
+def timeline(title, start, end, bucket, *criteria):
+  # Shows starting in [start, end), in start time order and grouped by day or
+  # week. Both queries read the range through ix_show_start_time, so their
+  # cost follows the shows in the range, not the years of shows before it.
+  bucket_start = show_bucket(bucket).label('bucket')
+  criteria = (Show.start_time >= start, Show.start_time < end) + criteria
+  counts = db.session.query(bucket_start, db.func.count(Show.id).label('shows')).filter(
+    *criteria).group_by(bucket_start).order_by(bucket_start).all()
+
+  rows, page = keyset_page(shows_query().add_columns(bucket_start).filter(*criteria), SHOW_KEYS)
+  args = {k: v for k, v in request.args.items() if k not in ('after', 'before', 'limit')}
+  page["args"] = args
+  totals = dict(counts)
+  groups = (
     {
-      "venue_id": show.venue_id,
-      "venue_name": venue.name,
-      "artist_id": show.artist_id,
-      "artist_name": artist.name,
-      "artist_image_link": artist.image_link,
-      "start_time": show.start_time.strftime("%a, %d %b %Y %H:%M:%S +0000")
+      "start": key,
+      "total": totals.get(key, 0),
+      "shows": [show_item(show) for show in group]
     }
-    for (show, artist, venue) in query
+    for key, group in itertools.groupby(rows, key=lambda show: show.bucket)
+  )
+  buckets = [
+    (name, url_for(request.endpoint, **dict(request.view_args, **dict(args, bucket = name))))
+    for name in TIMELINE_BUCKETS
   ]
-  return render_template('pages/shows.html', shows=data)
+  return render_listing('pages/timeline.html', title = title, start = start, end = end - timedelta(days = 1),
+    bucket = bucket, buckets = buckets, counts = counts, groups = groups, page = page)
+
+@app.route('/shows/timeline')
+@conditional(timeline_validator)
+@cached_page
+@read_only
+def shows_timeline():
+  bucket = request.args.get('bucket', 'day')
+  if bucket not in TIMELINE_BUCKETS:
+    abort(400)
+  today = datetime.now().replace(hour = 0, minute = 0, second = 0, microsecond = 0)
+  start = date_arg('from', today)
+  # 'to' is the last day shown
+  end = date_arg('to', start + timedelta(days = 6 if bucket == 'day' else 55)) + timedelta(days = 1)
+  if end <= start:
+    abort(400)
+  return timeline('Timeline', start, end, bucket)
+
+@app.route('/shows/weekend/<city>')
+@conditional(timeline_validator)
+@cached_page
+@read_only
+def shows_this_weekend(city):
+  # Friday to Sunday of this week; on the weekend itself, what is left of it
+  now = datetime.now()
+  friday = now.replace(hour = 0, minute = 0, second = 0, microsecond = 0) + timedelta(days = 4 - now.weekday())
+  criteria = [db.func.lower(Show.venue_city) == city.lower()]
+  if request.args.get('state'):
+    criteria.append(Show.venue_state == request.args['state'].upper())
+  return timeline('This weekend in ' + city, max(friday, now), friday + timedelta(days = 3), 'day', *criteria)
 
 @app.route('/shows/create')
 def create_shows():
@@ -469,7 +1581,9 @@ def create_show_submission():
       venue_id = data.venue_id.data,
       start_time = data.start_time.data
     )
+    fill_show(show)
     db.session.add(show)
+    count_show(show)
     db.session.commit()
   except:
     if error_message is None:
@@ -483,6 +1597,12 @@ def create_show_submission():
       flash('Show was successfully listed!')
       return redirect(url_for('shows'))
 
+@app.errorhandler(400)
+def bad_request_error(error):
+    if request.path.startswith('/api/'):
+        return api_error(400, error.description)
+    return error
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -491,6 +1611,255 @@ def not_found_error(error):
 def server_error(error):
     return render_template('errors/500.html'), 500
 
+#----------------------------------------------------------------------------#
+# API.
+#----------------------------------------------------------------------------#
+
+def dump_json(payload):
+  if orjson is not None:
+    return orjson.dumps(payload)
+  return json.dumps(
+    payload, separators=(',', ':'),
+    default=lambda value: value.isoformat() if isinstance(value, datetime) else str(value)
+  ).encode()
+
+def select_fields(item):
+  # ?fields=id,name trims every object to the requested keys
+  fields = request.args.get('fields')
+  if not fields:
+    return item
+  fields = set(fields.split(','))
+  return {key: value for key, value in item.items() if key in fields}
+
+def api_response(payload, status = 200):
+  body = dump_json(payload)
+  etag = hashlib.md5(body).hexdigest()
+  if status == 200 and request.if_none_match.contains_weak(etag):
+    response = app.response_class(status = 304)
+    response.set_etag(etag, weak = True)
+    return response
+
+  encoding = None
+  if len(body) >= app.config['API_COMPRESS_MIN_SIZE']:
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+      encoding, body = 'br', brotli.compress(body)
+    elif accepted['gzip']:
+      encoding, body = 'gzip', gzip.compress(body, 6)
+
+  response = app.response_class(body, status = status, mimetype = 'application/json')
+  # weak, as it identifies the JSON whatever the content coding
+  response.set_etag(etag, weak = True)
+  response.vary.add('Accept-Encoding')
+  if encoding:
+    response.headers['Content-Encoding'] = encoding
+  return response
+
+def api_error(status, message):
+  return api_response({"success": False, "error": message}, status)
+
+def api_page(rows, page):
+  return api_response({
+    "data": [select_fields(row._asdict()) for row in rows],
+    "next": page["next"],
+    "prev": page["prev"]
+  })
+
+@app.route('/api/v1/venues')
+@conditional(venues_validator)
+@read_only
+def api_venues():
+  query, keys = venue_areas_query()
+  rows, page = keyset_page(query, keys)
+  return api_response({
+    "data": [
+      dict(area, venues = [select_fields(venue) for venue in area["venues"]])
+      for area in venue_areas(rows)
+    ],
+    "next": page["next"],
+    "prev": page["prev"]
+  })
+
+@app.route('/api/v1/venues/<int:venue_id>')
+@conditional(venue_validator)
+@read_only
+def api_venue(venue_id):
+  data = venue_detail(venue_id)
+  if data is None:
+    return api_error(404, "Venue not found")
+  return api_response(select_fields(data))
+
+@app.route('/api/v1/venues/search')
+@read_only
+def api_search_venues():
+  results = search_entities(Venue, request.args.get('search_term', ''))
+  page = results.pop("page")
+  results["data"] = [select_fields(venue) for venue in results["data"]]
+  return api_response(dict(results, next = page["next"], prev = page["prev"]))
+
+@app.route('/api/v1/artists')
+@conditional(artists_validator)
+@read_only
+def api_artists():
+  return api_page(*keyset_page(artists_query(), ARTIST_KEYS))
+
+@app.route('/api/v1/artists/<int:artist_id>')
+@conditional(artist_validator)
+@read_only
+def api_artist(artist_id):
+  data = artist_detail(artist_id)
+  if data is None:
+    return api_error(404, "Artist not found")
+  return api_response(select_fields(data))
+
+@app.route('/api/v1/artists/search')
+@read_only
+def api_search_artists():
+  results = search_entities(Artist, request.args.get('search_term', ''))
+  page = results.pop("page")
+  results["data"] = [select_fields(artist) for artist in results["data"]]
+  return api_response(dict(results, next = page["next"], prev = page["prev"]))
+
+@app.route('/api/v1/shows')
+@conditional(shows_validator)
+@read_only
+def api_shows():
+  return api_page(*keyset_page(shows_query(), SHOW_KEYS))
+
+#----------------------------------------------------------------------------#
+# CLI.
+#----------------------------------------------------------------------------#
+
+# (description, query, index the plan is expected to use)
+INDEX_CHECKS = [
+  ('venue detail shows', lambda: venue_shows_query(1), 'ix_show_venue_id_start_time'),
+  ('artist detail shows', lambda: artist_shows_query(1), 'ix_show_artist_id_start_time'),
+  ('venues listing', lambda: venues_listing_query().limit(app.config['PAGE_SIZE']), 'ix_venue_city_state'),
+  ('area venues', lambda: area_venues_query(Venue.city == 'San Francisco', Venue.state == 'CA').order_by(
+    Venue.id).limit(app.config['PAGE_SIZE']), 'ix_venue_city_state'),
+  ('artists listing', lambda: artists_query().order_by(*ARTIST_KEYS).limit(app.config['PAGE_SIZE']), 'ix_artist_name'),
+  ('shows listing', lambda: shows_query().order_by(*SHOW_KEYS).limit(app.config['PAGE_SIZE']), 'ix_show_start_time'),
+  ('shows timeline', lambda: shows_query().filter(
+    Show.start_time >= datetime.now(), Show.start_time < datetime.now() + timedelta(days = 7)
+  ).order_by(*SHOW_KEYS).limit(app.config['PAGE_SIZE']), 'ix_show_start_time'),
+  ('weekend shows', lambda: shows_query().filter(
+    Show.start_time >= datetime.now(), Show.start_time < datetime.now() + timedelta(days = 3),
+    db.func.lower(Show.venue_city) == 'san francisco'
+  ).order_by(*SHOW_KEYS).limit(app.config['PAGE_SIZE']), 'ix_show_start_time'),
+  ('venues validator', lambda: db.session.query(db.func.max(Venue.updated_at)), 'ix_venue_updated_at'),
+  ('shows validator', lambda: db.session.query(db.func.max(Show.updated_at)), 'ix_show_updated_at'),
+  ('show rollover', lambda: Show.query.filter(db.not_(Show.counted_past), Show.start_time < datetime.now()), 'ix_show_counted_past_start_time'),
+]
+
+def venues_listing_query():
+  query, keys = venue_areas_query()
+  return query.order_by(*keys)
+
+def explain(query):
+  sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+  if db.engine.dialect.name == 'sqlite':
+    return '\n'.join(row[-1] for row in db.session.execute(db.text('EXPLAIN QUERY PLAN ' + sql)))
+  return '\n'.join(row[0] for row in db.session.execute(db.text('EXPLAIN ' + sql)))
+
+@app.cli.command('check-indexes')
+def check_indexes():
+  """EXPLAIN the detail and listing queries and fail unless each uses its index.
+
+  On Postgres sequential scans are disabled for the check, otherwise the
+  planner rightly prefers them on a near-empty development database.
+  """
+  if db.engine.dialect.name == 'postgresql':
+    db.session.execute(db.text('SET LOCAL enable_seqscan = off'))
+  failed = False
+  for description, query, index in INDEX_CHECKS:
+    plan = explain(query())
+    ok = index in plan
+    failed = failed or not ok
+    click.echo('{} {} ({})'.format('ok  ' if ok else 'FAIL', description, index))
+    if not ok:
+      click.echo('     ' + plan.replace('\n', '\n     '))
+  db.session.rollback()
+  if failed:
+    raise SystemExit(1)
+
+@app.cli.command('rollover-shows')
+@click.option('--every', type=int, default=0, help='Keep running and roll over again every N seconds.')
+def rollover_shows_command(every):
+  """Move shows that have started from the upcoming to the past counters.
+
+  Run it periodically, from cron or as a worker process with --every; shows
+  that started since the last run still count as upcoming in the venue
+  listing and in search.
+  """
+  while True:
+    click.echo('Rolled over {} shows'.format(rollover_shows()))
+    if not every:
+      break
+    time.sleep(every)
+
+@app.cli.command('recount-shows')
+def recount_shows_command():
+  """Rebuild every venue and artist show counter from the show table."""
+  recount_shows()
+  click.echo('Recounted the shows of every venue and artist')
+
+@app.cli.command('autocomplete-budget')
+@click.option('--names', default=1000000, show_default=True, help='Synthetic names to index.')
+@click.option('--lookups', default=10000, show_default=True, help='Prefix lookups to time.')
+def autocomplete_budget(names, lookups):
+  """Report the memory and lookup time of the autocomplete index.
+
+  Builds an index of synthetic venue and artist names, like the ones of
+  benchmark.py, next to the index of the names in the database, and prints
+  what each takes per worker process.
+  """
+  words = ['Blue', 'Red', 'Velvet', 'Electric', 'Golden', 'Midnight', 'Silver', 'Wild', 'Lazy', 'Neon',
+           'Hop', 'Room', 'Hall', 'Club', 'Band', 'Trio', 'Sound', 'Stage', 'Cellar', 'Garden']
+  rng = random.Random(0)
+  started = time.perf_counter()
+  index = PrefixIndex(
+    ('venue' if i % 3 == 0 else 'artist', i, '{} {} {}'.format(rng.choice(words), rng.choice(words), i))
+    for i in range(names)
+  )
+  built = time.perf_counter() - started
+
+  timings = []
+  for _ in range(lookups):
+    prefix = rng.choice(words)[:rng.randint(1, 4)].lower()
+    started = time.perf_counter()
+    index.search(prefix)
+    timings.append(time.perf_counter() - started)
+  timings.sort()
+  started = time.perf_counter()
+  index.add('venue', names, 'Midnight Hall')
+  index.remove('venue', names)
+  update = time.perf_counter() - started
+
+  memory = index.memory_usage()
+  click.echo('{} names: {:.1f} MB ({:.0f} bytes per name), built in {:.1f}s'.format(
+    names, memory / 1e6, memory / max(names, 1), built))
+  click.echo('lookup p50 {:.1f} us, p99 {:.1f} us; add + remove {:.1f} ms'.format(
+    timings[len(timings) // 2] * 1e6, timings[int(len(timings) * 0.99)] * 1e6, update * 1e3))
+  live = name_index.index()
+  click.echo('database: {} names, {:.1f} MB'.format(len(live), live.memory_usage() / 1e6))
+
+@app.cli.command('import-catalogue')
+@click.argument('kind', type=click.Choice(['venue', 'artist', 'show']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=5000, show_default=True, help='Rows written and committed at a time.')
+def import_catalogue(kind, path, batch_size):
+  """Bulk load venues, artists or shows from a CSV or JSONL file.
+
+  Artists are identified by name and venues by name and city; show rows
+  refer to them through artist_name, venue_name and venue_city, so load
+  venues and artists first.
+  """
+  from bulk_import import CatalogueLoader
+  loader = CatalogueLoader(db.engine, db.metadata, batch_size, report = click.echo)
+  total, elapsed = loader.load(kind, path)
+  # the loader writes through Core, past the session events
+  cache.clear()
+  click.echo('Loaded {} {} rows in {:.1f}s'.format(total, kind, elapsed))
 
 if not app.debug:
     file_handler = FileHandler('error.log')
@@ -502,10 +1871,42 @@ if not app.debug:
     app.logger.addHandler(file_handler)
     app.logger.info('errors')
 
+#----------------------------------------------------------------------------#
+# Warm-up.
+#----------------------------------------------------------------------------#
+
+# A new worker otherwise compiles each template, loads the babel locale data,
+# configures the ORM mappers and opens its database connections on the
+# requests that first need them. gunicorn.conf.py preloads in the master,
+# before the workers are forked from it, and opens the connections in every
+# worker before it accepts requests.
+
+def preload():
+  for name in app.jinja_env.list_templates(extensions = ['html']):
+    app.jinja_env.get_template(name)
+  format_datetime(datetime.now())
+  orm.configure_mappers()
+
+def open_connections():
+  # as many connections as the pool keeps, held at the same time so that
+  # each one is a new connection
+  for bind in [None] + replica_binds():
+    engine = db.get_engine(app, bind)
+    size = engine.pool.size() if hasattr(engine.pool, 'size') else 1
+    connections = [engine.connect() for _ in range(size)]
+    for connection in connections:
+      connection.execute(db.text('SELECT 1'))
+      connection.close()
+
+def warm_up():
+  preload()
+  open_connections()
+
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
 
+# Development server; production runs under gunicorn, see wsgi.py.
 # Default port:
 if __name__ == '__main__':
     app.run()
@@ -0,0 +1,160 @@
+import sys
+import threading
+import time
+from array import array
+
+# In-process prefix index behind the /autocomplete endpoint.
+#
+# Each kind (venue, artist) has its own list of names sorted by their
+# lowercased form, with a parallel array of 64-bit ids instead of a dict or
+# a tuple per name, which would triple the memory per entry. A lookup is a
+# binary search for the first name at or after the prefix and a walk of at
+# most `limit` names from there; a lookup for one kind never walks the
+# names of the other, and a lookup for both merges the two walks. Adding or
+# removing a name shifts the list and array in place (a memmove, a few
+# milliseconds at a million names); removing by id scans the id array of
+# the name's kind.
+#
+# Autocomplete wraps an index for the app: it is built on first use,
+# changes committed by this process are applied as they happen, and the
+# whole index is rebuilt in a background thread every `refresh_interval`
+# seconds to pick up names written by other processes.
+
+KINDS = ('venue', 'artist')
+
+
+def _position(names, key):
+    # bisect_left over the lowercased names, without storing them twice
+    lo, hi = 0, len(names)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if names[mid].lower() < key:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+class PrefixIndex(object):
+
+    def __init__(self, entries=()):
+        # entries: (kind, id, name)
+        rows = dict((kind, []) for kind in KINDS)
+        for kind, entity_id, name in entries:
+            rows[kind].append((name.lower(), name, entity_id))
+        self._names = {}
+        self._ids = {}
+        for kind in KINDS:
+            rows[kind].sort()
+            self._names[kind] = [name for _, name, _ in rows[kind]]
+            self._ids[kind] = array('q', (entity_id for _, _, entity_id in rows[kind]))
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(names) for names in self._names.values())
+
+    def add(self, kind, entity_id, name):
+        with self._lock:
+            names = self._names[kind]
+            i = _position(names, name.lower())
+            names.insert(i, name)
+            self._ids[kind].insert(i, entity_id)
+
+    def remove(self, kind, entity_id):
+        with self._lock:
+            try:
+                i = self._ids[kind].index(entity_id)
+            except ValueError:
+                return
+            del self._names[kind][i]
+            del self._ids[kind][i]
+
+    def replace(self, kind, entity_id, name):
+        self.remove(kind, entity_id)
+        self.add(kind, entity_id, name)
+
+    def search(self, prefix, limit=10, kind=None):
+        prefix = prefix.lower()
+        matches = []
+        with self._lock:
+            for match_kind in (KINDS if kind is None else (kind,)):
+                names, ids = self._names[match_kind], self._ids[match_kind]
+                i = _position(names, prefix)
+                end = min(i + limit, len(names))
+                while i < end and names[i].lower().startswith(prefix):
+                    matches.append((match_kind, ids[i], names[i]))
+                    i += 1
+        if kind is None:
+            matches.sort(key=lambda match: (match[2].lower(), match[2]))
+        return matches[:limit]
+
+    def memory_usage(self):
+        # bytes held by the lists, the name strings and the id arrays
+        with self._lock:
+            return sum(
+                sys.getsizeof(names) + sum(sys.getsizeof(name) for name in names) +
+                self._ids[kind].buffer_info()[1] * self._ids[kind].itemsize
+                for kind, names in self._names.items()
+            )
+
+
+class Autocomplete(object):
+
+    def __init__(self, load, refresh_interval=300):
+        # load() returns the (kind, id, name) of every entity
+        self.load = load
+        self.refresh_interval = refresh_interval
+        self.built_at = 0
+        self._index = None
+        self._replay = None
+        self._lock = threading.Lock()
+        self._first_build = threading.Lock()
+
+    def index(self):
+        if self._index is None:
+            # concurrent first requests wait for one build
+            with self._first_build:
+                if self._index is None:
+                    self.refresh()
+        elif time.time() - self.built_at >= self.refresh_interval and self._replay is None:
+            threading.Thread(target=self.refresh, daemon=True).start()
+        return self._index
+
+    def refresh(self):
+        with self._lock:
+            if self._replay is not None:
+                return
+            # changes committed while the new index loads are applied to both
+            self._replay = []
+        started = time.time()
+        try:
+            index = PrefixIndex(self.load())
+            with self._lock:
+                for action, kind, entity_id, name in self._replay:
+                    # the loaded index may have them already
+                    self._apply(index, 'remove' if action == 'remove' else 'replace', kind, entity_id, name)
+                self._index = index
+                self.built_at = started
+        except Exception:
+            # keep serving the old index and try again after another interval
+            self.built_at = started
+            raise
+        finally:
+            self._replay = None
+
+    def apply(self, changes):
+        # changes: ('add' | 'replace' | 'remove', kind, id, name)
+        with self._lock:
+            if self._replay is not None:
+                self._replay.extend(changes)
+            if self._index is not None:
+                for change in changes:
+                    self._apply(self._index, *change)
+
+    def _apply(self, index, action, kind, entity_id, name):
+        if action == 'remove':
+            index.remove(kind, entity_id)
+        elif action == 'replace':
+            index.replace(kind, entity_id, name)
+        else:
+            index.add(kind, entity_id, name)
@@ -0,0 +1,399 @@
+"""Load-test benchmark for the Fyyur endpoints.
+
+Seeds a database with synthetic venues, artists and shows at the requested
+scale, drives the listing, detail, search and form endpoints through the Flask
+test client and records latency percentiles, queries per request and peak
+RSS. The results are written as JSON so CI can diff them against a stored
+baseline:
+
+    python benchmark.py --shows 100000 --output baseline.json
+    python benchmark.py --shows 100000 --compare baseline.json
+
+The comparison fails on more queries per request or larger responses than
+the baseline. Latency and memory depend on the machine, so they are only
+compared with --latency, against a baseline taken on the same machine:
+
+    python benchmark.py --shows 100000 --compare baseline.json --latency
+
+With --workers it also starts the production server (gunicorn, wsgi.py)
+once per worker count and reports the requests per second it sustains:
+
+    python benchmark.py --shows 100000 --workers 1,2,4,8
+
+With --startup it starts fresh processes instead and reports how long
+importing the app takes and how slow the first request to each page is:
+cold, with the compiled templates cached on disk, and after warm-up:
+
+    python benchmark.py --startup 5
+
+With --formatting it also times the datetime filter of the show pages
+against the path it replaced (the controller formatting the start time as
+a string, then dateutil parsing it back and babel formatting it):
+
+    python benchmark.py --formatting 20000
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+GENRES = ['Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk', 'Hip-Hop',
+          'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae',
+          'Rock n Roll', 'Soul', 'Other']
+STATES = ['CA', 'NY', 'TX', 'WA', 'IL', 'FL', 'CO', 'OR', 'GA', 'MA']
+WORDS = ['Blue', 'Red', 'Velvet', 'Electric', 'Golden', 'Midnight', 'Silver', 'Wild', 'Lazy', 'Neon',
+         'Hop', 'Room', 'Hall', 'Club', 'Band', 'Trio', 'Sound', 'Stage', 'Cellar', 'Garden']
+
+
+def name(rng, i):
+    return '{} {} {}'.format(rng.choice(WORDS), rng.choice(WORDS), i)
+
+
+def seed(fyyur, shows, seed_value=0):
+    from bulk_import import CatalogueLoader
+
+    rng = random.Random(seed_value)
+    venues = max(1, shows // 20)
+    artists = max(1, shows // 10)
+    cities = ['City {}'.format(i) for i in range(max(1, venues // 25))]
+    now = datetime.utcnow()
+
+    fyyur.db.drop_all()
+    fyyur.db.create_all()
+    loader = CatalogueLoader(fyyur.db.engine, fyyur.db.metadata, batch_size=10000, report=lambda line: None)
+    loader.load_records('venue', ({
+        'name': 'Venue ' + name(rng, i),
+        'city': cities[i % len(cities)],
+        'state': STATES[i % len(STATES)],
+        'address': '{} Main Street'.format(i),
+        'genres': rng.sample(GENRES, 3),
+        'seeking_talent': i % 2 == 0
+    } for i in range(venues)))
+    loader.load_records('artist', ({
+        'name': 'Artist ' + name(rng, i),
+        'city': rng.choice(cities),
+        'state': rng.choice(STATES),
+        'genres': rng.sample(GENRES, 2),
+        'seeking_venue': i % 3 == 0
+    } for i in range(artists)))
+
+    venue_keys = [(v.name, v.city) for v in fyyur.db.session.query(fyyur.Venue.name, fyyur.Venue.city)]
+    artist_names = [a.name for a in fyyur.db.session.query(fyyur.Artist.name)]
+    fyyur.db.session.remove()
+
+    def show_records():
+        for i in range(shows):
+            venue_name, venue_city = rng.choice(venue_keys)
+            yield {
+                'venue_name': venue_name,
+                'venue_city': venue_city,
+                'artist_name': rng.choice(artist_names),
+                'start_time': (now + timedelta(hours=rng.randint(-24 * 365 * 3, 24 * 365))).isoformat()
+            }
+    loader.load_records('show', show_records())
+    return {'venues': venues, 'artists': artists, 'shows': shows}
+
+
+def percentile(values, p):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))
+    return values[index]
+
+
+def run(fyyur, requests, rng):
+    client = fyyur.app.test_client()
+    venue_ids = [v.id for v in fyyur.db.session.query(fyyur.Venue.id).limit(1000)]
+    artist_ids = [a.id for a in fyyur.db.session.query(fyyur.Artist.id).limit(1000)]
+    fyyur.db.session.remove()
+
+    scenarios = [
+        ('venues', lambda: client.get('/venues')),
+        ('artists', lambda: client.get('/artists')),
+        ('shows', lambda: client.get('/shows')),
+        ('show_venue', lambda: client.get('/venues/{}'.format(rng.choice(venue_ids)))),
+        ('show_artist', lambda: client.get('/artists/{}'.format(rng.choice(artist_ids)))),
+        ('search_venues', lambda: client.post('/venues/search', data={'search_term': rng.choice(WORDS)})),
+        ('search_artists', lambda: client.post('/artists/search', data={'search_term': rng.choice(WORDS)})),
+        ('new_venue', lambda: client.get('/venues/create')),
+        ('edit_artist', lambda: client.get('/artists/{}/edit'.format(rng.choice(artist_ids)))),
+    ]
+
+    queries = []
+    event.listen(fyyur.db.engine, 'before_cursor_execute', lambda *args: queries.append(1))
+
+    results = {}
+    for label, scenario in scenarios:
+        scenario()  # warm up templates and the connection pool
+        latencies = []
+        query_counts = []
+        sizes = []
+        for _ in range(requests):
+            del queries[:]
+            started = time.perf_counter()
+            response = scenario()
+            body = response.get_data()
+            latencies.append((time.perf_counter() - started) * 1000)
+            query_counts.append(len(queries))
+            sizes.append(len(body))
+            if response.status_code != 200:
+                raise RuntimeError('{} returned {}'.format(label, response.status_code))
+        results[label] = {
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'queries_per_request': round(sum(query_counts) / float(len(query_counts)), 2),
+            'max_queries': max(query_counts),
+            'max_bytes': max(sizes)
+        }
+    return results
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('server did not answer at ' + url)
+
+
+def drive(base, paths, clients, duration):
+    done = []
+    failed = []
+    deadline = time.time() + duration
+
+    def client(seed_value):
+        rng = random.Random(seed_value)
+        ok = errors = 0
+        while time.time() < deadline:
+            try:
+                urllib.request.urlopen(base + rng.choice(paths)).read()
+                ok += 1
+            except OSError:
+                errors += 1
+        done.append(ok)
+        failed.append(errors)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(done), sum(failed)
+
+
+def throughput(fyyur, database_url, worker_counts, threads, clients, duration, cache, parallel_detail):
+    venue_ids = [v.id for v in fyyur.db.session.query(fyyur.Venue.id).limit(1000)]
+    artist_ids = [a.id for a in fyyur.db.session.query(fyyur.Artist.id).limit(1000)]
+    fyyur.db.session.remove()
+    paths = ['/venues', '/artists', '/shows']
+    paths += ['/venues/{}'.format(i) for i in venue_ids[:50]] + ['/artists/{}'.format(i) for i in artist_ids[:50]]
+
+    results = {}
+    for workers in worker_counts:
+        port = free_port()
+        env = dict(os.environ, DATABASE_URL=database_url, WEB_CONCURRENCY=str(workers), WEB_THREADS=str(threads),
+                   SECRET_KEY='benchmark', CACHE_TYPE='lru' if cache else 'null',
+                   PARALLEL_DETAIL_QUERIES='1' if parallel_detail else '0')
+        server = subprocess.Popen(
+            [sys.executable, '-c', 'from gunicorn.app.wsgiapp import run; run()', '-c', 'gunicorn.conf.py', '--bind', '127.0.0.1:{}'.format(port), 'wsgi:app'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            base = 'http://127.0.0.1:{}'.format(port)
+            wait_for(base + '/')
+            ok, errors = drive(base, paths, clients, duration)
+        finally:
+            server.terminate()
+            server.wait()
+        results[str(workers)] = {'requests_per_second': round(ok / float(duration), 1), 'errors': errors}
+    return results
+
+
+# Runs in a fresh process: import the app, optionally warm it up, then time
+# the first request to each page given on the command line
+STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import wsgi
+imported = time.perf_counter()
+if sys.argv[1] == 'warm':
+    wsgi.create_app(warm_up=True)
+warmed = time.perf_counter()
+client = wsgi.app.test_client()
+first = {}
+for path in sys.argv[2:]:
+    request_started = time.perf_counter()
+    client.get(path).get_data()
+    first[path] = (time.perf_counter() - request_started) * 1000
+print(json.dumps({'import_ms': (imported - started) * 1000, 'warm_up_ms': (warmed - imported) * 1000, 'first_ms': first}))
+"""
+
+
+def startup(fyyur, database_url, runs):
+    venue_id = fyyur.db.session.query(fyyur.Venue.id).limit(1).scalar()
+    artist_id = fyyur.db.session.query(fyyur.Artist.id).limit(1).scalar()
+    fyyur.db.session.remove()
+    paths = ['/', '/venues', '/artists', '/shows', '/venues/{}'.format(venue_id), '/artists/{}'.format(artist_id)]
+
+    template_cache = tempfile.mkdtemp()
+    modes = [
+        # (mode, bytecode cache directory, warm up before the first request)
+        ('cold', '', False),
+        ('bytecode_cache', template_cache, False),
+        ('warm_up', template_cache, True),
+    ]
+    results = {}
+    for mode, cache_dir, warm in modes:
+        env = dict(os.environ, DATABASE_URL=database_url, SECRET_KEY='benchmark', CACHE_TYPE='null',
+                   TEMPLATE_CACHE_DIR=cache_dir)
+        samples = []
+        for _ in range(runs + (1 if cache_dir else 0)):
+            output = subprocess.check_output(
+                [sys.executable, '-c', STARTUP_SCRIPT, 'warm' if warm else 'cold'] + paths,
+                cwd=os.path.dirname(os.path.abspath(__file__)), env=env, stderr=subprocess.DEVNULL
+            )
+            samples.append(json.loads(output.decode().strip().splitlines()[-1]))
+        if cache_dir:
+            # the first run fills the cache
+            samples = samples[1:]
+        results[mode] = {
+            'import_ms': round(percentile([s['import_ms'] for s in samples], 50), 1),
+            'warm_up_ms': round(percentile([s['warm_up_ms'] for s in samples], 50), 1),
+            'first_request_ms': {path: round(percentile([s['first_ms'][path] for s in samples], 50), 1) for path in paths}
+        }
+    return results
+
+
+def formatting(fyyur, iterations):
+    import babel.dates
+    import dateutil.parser
+
+    value = datetime(2030, 5, 21, 21, 30)
+    pattern = "EEEE MMMM, d, y 'at' h:mma"
+
+    def string_path():
+        return babel.dates.format_datetime(dateutil.parser.parse(value.strftime('%Y-%m-%d %H:%M:%S')), pattern, locale='en')
+
+    def filter_path():
+        return fyyur.format_datetime(value, 'full')
+
+    if string_path() != filter_path():
+        raise RuntimeError('datetime filter output differs: {!r} != {!r}'.format(filter_path(), string_path()))
+    results = {}
+    for label, path in (('string_parse_us', string_path), ('datetime_filter_us', filter_path)):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            path()
+        results[label] = round((time.perf_counter() - started) / iterations * 1e6, 1)
+    results['speedup'] = round(results['string_parse_us'] / results['datetime_filter_us'], 1)
+    return results
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(rss / (1024.0 * 1024.0) if sys.platform == 'darwin' else rss / 1024.0, 1)
+
+
+def compare(results, baseline, tolerance, latency=False):
+    regressions = []
+    for label, current in results['endpoints'].items():
+        previous = baseline['endpoints'].get(label)
+        if previous is None:
+            continue
+        if current['max_queries'] > previous['max_queries']:
+            regressions.append('{}: queries {} -> {}'.format(label, previous['max_queries'], current['max_queries']))
+        if 'max_bytes' in previous and current['max_bytes'] > previous['max_bytes'] * (1 + tolerance):
+            regressions.append('{}: response {} bytes -> {} bytes'.format(label, previous['max_bytes'], current['max_bytes']))
+        if latency and current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append('{}: p95 {} ms -> {} ms'.format(label, previous['p95_ms'], current['p95_ms']))
+    if latency and results['peak_rss_mb'] > baseline['peak_rss_mb'] * (1 + tolerance):
+        regressions.append('peak RSS {} MB -> {} MB'.format(baseline['peak_rss_mb'], results['peak_rss_mb']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shows', type=int, default=1000, help='number of shows to seed (e.g. 1000, 100000, 1000000)')
+    parser.add_argument('--requests', type=int, default=50, help='requests per endpoint')
+    parser.add_argument('--database-url', help='database to seed and query (seeding drops and recreates every table); defaults to a temporary SQLite file')
+    parser.add_argument('--no-seed', action='store_true', help='reuse the data already in --database-url')
+    parser.add_argument('--cache', action='store_true', help='keep the page cache enabled')
+    parser.add_argument('--parallel-detail', action='store_true', help='run the detail page queries concurrently (PARALLEL_DETAIL_QUERIES)')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--compare', help='baseline JSON to compare against; exits 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative growth against the baseline')
+    parser.add_argument('--latency', action='store_true', help='also fail on p95 latency and peak RSS regressions (compare against a baseline from the same machine)')
+    parser.add_argument('--workers', help='comma separated gunicorn worker counts to measure throughput for, e.g. 1,2,4')
+    parser.add_argument('--threads', type=int, default=4, help='threads per gunicorn worker')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent HTTP clients in --workers mode')
+    parser.add_argument('--duration', type=float, default=10, help='seconds of load per worker count')
+    parser.add_argument('--startup', type=int, metavar='RUNS', help='measure import time and first requests over RUNS fresh processes')
+    parser.add_argument('--formatting', type=int, metavar='ITERATIONS', help='time the show start time formatting over ITERATIONS calls')
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+
+    import app as fyyur
+    from cache import NullCache
+    fyyur.app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    if not args.cache:
+        fyyur.cache = NullCache()
+    fyyur.app.config['PARALLEL_DETAIL_QUERIES'] = args.parallel_detail
+
+    started = time.time()
+    scale = None if args.no_seed else seed(fyyur, args.shows)
+    seed_seconds = round(time.time() - started, 1)
+
+    results = {
+        'database': fyyur.db.engine.dialect.name,
+        'scale': scale,
+        'seed_seconds': seed_seconds,
+        'requests_per_endpoint': args.requests,
+        'endpoints': run(fyyur, args.requests, random.Random(1)),
+        'peak_rss_mb': peak_rss_mb()
+    }
+    if args.startup:
+        results['startup'] = startup(fyyur, database_url, args.startup)
+    if args.formatting:
+        results['formatting'] = formatting(fyyur, args.formatting)
+    if args.workers:
+        results['throughput'] = throughput(fyyur, database_url, [int(w) for w in args.workers.split(',')],
+                                           args.threads, args.clients, args.duration, args.cache, args.parallel_detail)
+    print(json.dumps(results, indent=2))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.latency)
+        for regression in regressions:
+            print('REGRESSION ' + regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
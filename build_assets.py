@@ -0,0 +1,130 @@
+"""Build the fingerprinted, minified and precompressed static bundles.
+
+Concatenates the stylesheets and scripts of templates/layouts/main.html into
+a few bundles, minifies them, names every output after a hash of its content
+and writes .gz (and .br, when the brotli module is installed) copies next to
+it, all under static/dist/. The templates find the current file names in
+static/dist/manifest.json through the asset_urls() helper and fall back to
+the unbundled files when no build exists.
+
+    python build_assets.py [--clean]
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+STATIC = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST = os.path.join(STATIC, 'dist')
+
+# bundle name -> source files, relative to static/ and in load order
+BUNDLES = {
+    'css/app.css': ['css/bootstrap.min.css', 'css/layout.main.css', 'css/main.css',
+                    'css/main.responsive.css', 'css/main.quickfix.css'],
+    'js/head.js': ['js/libs/modernizr-2.8.2.min.js', 'js/libs/moment.min.js', 'js/script.js'],
+    'js/app.js': ['js/libs/bootstrap-3.1.1.min.js', 'js/plugins.js'],
+    # loaded on their own (jQuery fallback, old IE only)
+    'js/libs/jquery-1.11.1.min.js': ['js/libs/jquery-1.11.1.min.js'],
+    'js/libs/respond-1.4.2.min.js': ['js/libs/respond-1.4.2.min.js'],
+}
+
+CSS_STRINGS = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')')
+CSS_URLS = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def absolute_urls(css, source):
+    # the bundle lives in another directory, so relative url()s are made
+    # absolute from the directory of the file they came from
+    base = posixpath.dirname(source)
+
+    def rewrite(match):
+        url = match.group(2)
+        if re.match(r'^([a-z]+:|/|#)', url):
+            return match.group(0)
+        return 'url({0}/static/{1}{0})'.format(match.group(1), posixpath.normpath(posixpath.join(base, url)))
+    return CSS_URLS.sub(rewrite, css)
+
+
+def minify_css(css):
+    css = re.sub(r'/\*[^!][\s\S]*?\*/', '', css)
+    parts = CSS_STRINGS.split(css)
+    for i in range(0, len(parts), 2):
+        # strings are the odd parts and are left alone
+        text = re.sub(r'\s+', ' ', parts[i])
+        text = re.sub(r'\s*([{};,])\s*', r'\1', text)
+        text = re.sub(r':\s+', ':', text)
+        parts[i] = text.replace(';}', '}')
+    return ''.join(parts).strip()
+
+
+def minify_js(js):
+    # without rjsmin the (mostly minified already) files are only concatenated
+    return rjsmin.jsmin(js) if rjsmin is not None else js
+
+
+def build_bundle(name, sources):
+    contents = []
+    for source in sources:
+        with open(os.path.join(STATIC, source), encoding='utf-8') as f:
+            text = f.read()
+        if name.endswith('.css'):
+            contents.append(minify_css(absolute_urls(text, source)))
+        else:
+            contents.append(minify_js(text).rstrip().rstrip(';') + ';')
+    body = '\n'.join(contents).encode('utf-8')
+
+    root, extension = posixpath.splitext(name)
+    filename = '{}.{}{}'.format(root, hashlib.sha256(body).hexdigest()[:12], extension)
+    path = os.path.join(DIST, filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(body)
+    # mtime=0 keeps the .gz identical between builds of the same content
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(body, 9, mtime=0))
+    sizes = [len(body), os.path.getsize(path + '.gz')]
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(body, quality=11))
+        sizes.append(os.path.getsize(path + '.br'))
+    original = sum(os.path.getsize(os.path.join(STATIC, source)) for source in sources)
+    print('{:<30} {:>8} bytes from {} file(s) -> {}'.format(
+        filename, original, len(sources), ' / '.join(str(size) for size in sizes)))
+    return filename
+
+
+def build(clean=False):
+    if clean:
+        shutil.rmtree(DIST, ignore_errors=True)
+    manifest = {name: build_bundle(name, sources) for name, sources in BUNDLES.items()}
+    # written last and replaced in one step, so a running app never reads a
+    # manifest that points at files not written yet
+    path = os.path.join(DIST, 'manifest.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+    print('Wrote {}'.format(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clean', action='store_true',
+                        help='remove earlier builds first (pages cached before the deploy may still refer to them)')
+    build(parser.parse_args().clean)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+import collections
+import csv
+import io
+import itertools
+import json
+import time
+from datetime import datetime
+
+import dateutil.parser
+import sqlalchemy as sa
+
+# Streaming catalogue loader behind `flask import-catalogue`.
+#
+# Records are read from CSV or JSONL files in batches, natural keys are
+# resolved to ids (artists by name, venues by name and city, shows refer to
+# both) and every batch is written and committed on its own, through COPY on
+# Postgres and a Core executemany elsewhere. Only the current batch and the
+# id lookups it needed are kept in memory. Loaded shows are added to the
+# upcoming/past show counters of their venues and artists in the same
+# transaction as the batch, and carry copies of the artist and venue columns
+# the show pages display (the show read model in app.py). Every row written
+# gets a fresh updated_at (and version), which the page ETags derive from.
+
+ENTITY_COLUMNS = {
+    'venue': ['name', 'city', 'state', 'address', 'phone', 'image_link', 'facebook_link',
+              'website', 'seeking_talent', 'seeking_description'],
+    'artist': ['name', 'city', 'state', 'phone', 'image_link', 'facebook_link',
+               'website', 'seeking_venue', 'seeking_description'],
+}
+SHOW_COLUMNS = ['artist_id', 'venue_id', 'start_time', 'counted_past', 'artist_name', 'artist_image_link',
+                'venue_name', 'venue_city', 'venue_state', 'venue_image_link', 'updated_at']
+BOOLEAN_COLUMNS = {'seeking_talent', 'seeking_venue'}
+
+
+def read_records(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.jsonl') or path.endswith('.json'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            for record in csv.DictReader(f):
+                yield record
+
+
+def batches(records, size):
+    records = iter(records)
+    while True:
+        batch = list(itertools.islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+
+def to_bool(value):
+    if isinstance(value, bool) or value is None:
+        return bool(value)
+    return value.strip().lower() in ('1', 'true', 'yes', 'y', 't')
+
+
+def to_genres(value):
+    if isinstance(value, list):
+        names = value
+    else:
+        names = (value or '').split(',')
+    return list(dict.fromkeys(name.strip() for name in names if name.strip()))
+
+
+class CatalogueLoader(object):
+
+    def __init__(self, engine, metadata, batch_size=5000, report=print):
+        self.engine = engine
+        self.tables = metadata.tables
+        self.batch_size = batch_size
+        self.report = report
+        self.genre_ids = {}
+
+    def load(self, kind, path):
+        return self.load_records(kind, read_records(path))
+
+    def load_records(self, kind, records):
+        started = time.time()
+        total = 0
+        for batch in batches(records, self.batch_size):
+            with self.engine.begin() as conn:
+                if kind == 'show':
+                    self.load_shows(conn, batch)
+                else:
+                    self.load_entities(conn, kind, batch)
+            total += len(batch)
+            elapsed = time.time() - started
+            self.report('{} {} rows, {:.0f} rows/s'.format(total, kind, total / max(elapsed, 1e-9)))
+        return total, time.time() - started
+
+    # writing
+
+    def insert(self, conn, table_name, columns, rows):
+        if not rows:
+            return
+        if conn.dialect.name == 'postgresql':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in rows:
+                writer.writerow(['\\N' if row[c] is None else row[c] for c in columns])
+            buffer.seek(0)
+            cursor = conn.connection.cursor()
+            cursor.copy_expert(
+                'COPY "{}" ({}) FROM STDIN WITH (FORMAT csv, NULL \'\\N\')'.format(table_name, ', '.join(columns)),
+                buffer
+            )
+        else:
+            conn.execute(self.tables[table_name].insert(), rows)
+
+    def insert_returning_ids(self, conn, table_name, columns, rows):
+        # ids of the inserted rows, in order. Names are not unique, so the rows
+        # cannot be found again by natural key afterwards.
+        if conn.dialect.name == 'postgresql':
+            # reserve the ids from the sequence first so the rows still go through COPY
+            ids = [row_id for row_id, in conn.execute(
+                sa.text("SELECT nextval(pg_get_serial_sequence(:table_name, 'id')) FROM generate_series(1, :n)"),
+                table_name=table_name, n=len(rows))]
+            for row, row_id in zip(rows, ids):
+                row['id'] = row_id
+            self.insert(conn, table_name, ['id'] + columns, rows)
+            return ids
+        # elsewhere the first row is inserted on its own, which takes the write
+        # lock for the rest of the transaction; the ids after max(id) are then
+        # free for this batch and the other rows go through one executemany
+        if not rows:
+            return []
+        table = self.tables[table_name]
+        conn.execute(table.insert(), rows[0])
+        first_id = conn.execute(sa.select([sa.func.max(table.c.id)])).scalar()
+        ids = list(range(first_id, first_id + len(rows)))
+        for row, row_id in zip(rows[1:], ids[1:]):
+            row['id'] = row_id
+        self.insert(conn, table_name, ['id'] + columns, rows[1:])
+        return ids
+
+    # natural keys
+
+    def find_artists(self, conn, names, *columns):
+        # name -> row of id, name and the extra columns (None when unknown)
+        artist = self.tables['artist']
+        rows = dict.fromkeys(names)
+        query = sa.select([artist.c.id, artist.c.name] + [artist.c[c] for c in columns]).where(
+            artist.c.name.in_(list(rows)))
+        for row in conn.execute(query):
+            rows[row.name] = row
+        return rows
+
+    def find_venues(self, conn, keys, *columns):
+        # looked up by city through ix_venue_city_state, then matched exactly
+        venue = self.tables['venue']
+        rows = dict.fromkeys(keys)
+        query = sa.select([venue.c.id, venue.c.name, venue.c.city] + [venue.c[c] for c in columns]).where(
+            sa.and_(venue.c.city.in_(list(set(city for name, city in rows))),
+                    venue.c.name.in_(list(set(name for name, city in rows)))))
+        for row in conn.execute(query):
+            if (row.name, row.city) in rows:
+                rows[(row.name, row.city)] = row
+        return rows
+
+    def resolve_genres(self, conn, names):
+        genre = self.tables['genre']
+        missing = [name for name in set(names) if name not in self.genre_ids]
+        if missing:
+            query = sa.select([genre.c.id, genre.c.name]).where(genre.c.name.in_(missing))
+            self.genre_ids.update({name: genre_id for genre_id, name in conn.execute(query)})
+            new = [{'name': name} for name in missing if name not in self.genre_ids]
+            if new:
+                conn.execute(genre.insert(), new)
+                query = sa.select([genre.c.id, genre.c.name]).where(genre.c.name.in_([g['name'] for g in new]))
+                self.genre_ids.update({name: genre_id for genre_id, name in conn.execute(query)})
+        return self.genre_ids
+
+    # loaders
+
+    def load_entities(self, conn, kind, batch):
+        columns = ENTITY_COLUMNS[kind]
+        now = datetime.utcnow()
+        rows = []
+        genres = []
+        for record in batch:
+            row = {c: record.get(c) or None for c in columns}
+            for c in BOOLEAN_COLUMNS.intersection(columns):
+                row[c] = to_bool(record.get(c))
+            row['updated_at'] = now
+            rows.append(row)
+            genres.append(to_genres(record.get('genres')))
+        if not any(genres):
+            self.insert(conn, kind, columns + ['updated_at'], rows)
+            return
+        ids = self.insert_returning_ids(conn, kind, columns + ['updated_at'], rows)
+        genre_ids = self.resolve_genres(conn, [name for names in genres for name in names])
+        links = [
+            {kind + '_id': entity_id, 'genre_id': genre_ids[name]}
+            for entity_id, names in zip(ids, genres)
+            for name in names
+        ]
+        self.insert(conn, kind + '_genre', [kind + '_id', 'genre_id'], links)
+
+    def count_shows(self, conn, rows):
+        for table_name, key in (('venue', 'venue_id'), ('artist', 'artist_id')):
+            table = self.tables[table_name]
+            for past, column in ((False, 'upcoming_shows_count'), (True, 'past_shows_count')):
+                counts = collections.Counter(row[key] for row in rows if row['counted_past'] == past)
+                if not counts:
+                    continue
+                query = table.update().where(table.c.id == sa.bindparam('entity_id')).values({
+                    column: table.c[column] + sa.bindparam('shows'),
+                    'version': table.c.version + 1,
+                    'updated_at': datetime.utcnow()
+                })
+                conn.execute(query, [{'entity_id': entity_id, 'shows': n} for entity_id, n in counts.items()])
+
+    def load_shows(self, conn, batch):
+        now = datetime.now()
+        artists = self.find_artists(conn, [record['artist_name'] for record in batch], 'image_link')
+        venues = self.find_venues(conn, [(record['venue_name'], record['venue_city']) for record in batch],
+                                  'state', 'image_link')
+        rows = []
+        for record in batch:
+            artist = artists[record['artist_name']]
+            venue = venues[(record['venue_name'], record['venue_city'])]
+            if artist is None or venue is None:
+                raise ValueError('Unknown artist or venue in show record: {}'.format(record))
+            start_time = dateutil.parser.parse(record['start_time']).replace(tzinfo=None)
+            rows.append({
+                'artist_id': artist.id,
+                'venue_id': venue.id,
+                'start_time': start_time,
+                'counted_past': start_time < now,
+                'artist_name': artist.name,
+                'artist_image_link': artist.image_link,
+                'venue_name': venue.name,
+                'venue_city': venue.city,
+                'venue_state': venue.state,
+                'venue_image_link': venue.image_link,
+                'updated_at': datetime.utcnow()
+            })
+        self.insert(conn, 'show', SHOW_COLUMNS, rows)
+        self.count_shows(conn, rows)
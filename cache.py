@@ -0,0 +1,147 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+# Response caches used by app.py. Every backend exposes the same small
+# interface: get/set/clear/stats plus a `generation` counter that is bumped
+# on clear(), so a page rendered from data that was invalidated while it was
+# being built is never stored.
+
+
+class NullCache(object):
+
+    generation = 0
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, generation=None):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {"backend": "null"}
+
+
+class LRUCache(object):
+    """In-process LRU cache with a per-entry TTL."""
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def stats(self):
+        return {
+            "backend": "lru",
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl
+        }
+
+
+class RedisCache(object):
+    """Cache shared by every worker through a (local) Redis server.
+
+    Keys are namespaced by a generation number stored in Redis, so clear()
+    is a single INCR and invalidates the pages of every process at once.
+    Old generations simply expire through their TTL. get() and set() run as
+    Lua scripts, so each is one round trip however many keys it touches.
+    """
+
+    # KEYS: generation; ARGV: prefix, key
+    GET_SCRIPT = """
+        local generation = redis.call('GET', KEYS[1]) or '0'
+        local value = redis.call('GET', ARGV[1] .. generation .. ':' .. ARGV[2])
+        redis.call('INCR', ARGV[1] .. (value and 'hits' or 'misses'))
+        return value
+    """
+    # KEYS: generation; ARGV: prefix, key, ttl, value, generation rendered from
+    SET_SCRIPT = """
+        local generation = redis.call('GET', KEYS[1]) or '0'
+        if ARGV[5] ~= '' and ARGV[5] ~= generation then
+            return 0
+        end
+        redis.call('SETEX', ARGV[1] .. generation .. ':' .. ARGV[2], ARGV[3], ARGV[4])
+        return 1
+    """
+
+    def __init__(self, url, ttl=300, prefix='fyyur:page:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self._get = self.client.register_script(self.GET_SCRIPT)
+        self._set = self.client.register_script(self.SET_SCRIPT)
+
+    @property
+    def generation(self):
+        return int(self.client.get(self.prefix + 'generation') or 0)
+
+    def get(self, key):
+        value = self._get(keys=[self.prefix + 'generation'], args=[self.prefix, key])
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, generation=None):
+        self._set(keys=[self.prefix + 'generation'],
+                  args=[self.prefix, key, self.ttl, pickle.dumps(value), '' if generation is None else generation])
+
+    def clear(self):
+        self.client.incr(self.prefix + 'generation')
+
+    def stats(self):
+        hits, misses, generation = self.client.mget(
+            self.prefix + 'hits', self.prefix + 'misses', self.prefix + 'generation')
+        return {
+            "backend": "redis",
+            "hits": int(hits or 0),
+            "misses": int(misses or 0),
+            "generation": int(generation or 0),
+            "ttl": self.ttl
+        }
+
+
+def create_cache(config):
+    backend = config.get('CACHE_TYPE', 'lru')
+    if backend == 'lru':
+        return LRUCache(config.get('CACHE_MAX_ENTRIES', 1024), config.get('CACHE_TTL', 300))
+    if backend == 'redis':
+        return RedisCache(config['CACHE_REDIS_URL'], config.get('CACHE_TTL', 300))
+    if backend == 'null':
+        return NullCache()
+    raise ValueError('Unknown CACHE_TYPE: {}'.format(backend))
@@ -1,11 +1,107 @@
 import os
-SECRET_KEY = os.urandom(32)
+
+def env_flag(name, default):
+    value = os.environ.get(name)
+    return default if value is None else value.lower() in ('1', 'true', 'yes', 'on')
+
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
+# Settings profile: 'development' (the default) or 'production', picked with
+# FYYUR_CONFIG. The profile only changes defaults, every setting that reads
+# the environment below can still be overridden on its own.
+PROFILE = os.environ.get('FYYUR_CONFIG', 'development')
+PRODUCTION = PROFILE == 'production'
+
+# Every worker process must share the key, or sessions and flashed messages
+# break between them; set SECRET_KEY in production.
+SECRET_KEY = os.environ.get('SECRET_KEY') or os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 # Enable debug mode.
-DEBUG = True
+DEBUG = env_flag('FYYUR_DEBUG', not PRODUCTION)
 
 # Connect to the database
-SQLALCHEMY_DATABASE_URI = 'postgresql://jogallar@localhost:5432/fyyur'
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgresql://jogallar@localhost:5432/fyyur')
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+# Read replicas, as comma separated URLs. The listing, detail and search
+# pages read from one of them; writes, and the reads of a client that wrote
+# in the last REPLICA_STICKY_SECONDS, go to the primary above.
+SQLALCHEMY_BINDS = {
+    'replica{}'.format(i): uri
+    for i, uri in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')))
+}
+REPLICA_STICKY_SECONDS = env_int('REPLICA_STICKY_SECONDS', 10)
+# Connection pool per worker process. Keep workers * threads below
+# pool_size + max_overflow, and the sum over all workers below the server's
+# max_connections. Recycling and the pre-ping drop connections the server or
+# a proxy closed in between. (SQLite files use no pool and ignore the sizes.)
+SQLALCHEMY_ENGINE_OPTIONS = {
+    'pool_size': env_int('DB_POOL_SIZE', 10 if PRODUCTION else 5),
+    'max_overflow': env_int('DB_MAX_OVERFLOW', 5 if PRODUCTION else 10),
+    'pool_timeout': env_int('DB_POOL_TIMEOUT', 10 if PRODUCTION else 30),
+    'pool_recycle': env_int('DB_POOL_RECYCLE', 1800 if PRODUCTION else -1),
+    'pool_pre_ping': env_flag('DB_POOL_PRE_PING', PRODUCTION),
+}
+
+# Listing pages (rows per page and the upper bound for ?limit=)
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# venues shown per area on the venue listings; the rest are linked
+VENUES_PER_AREA = 10
+# Stream the listing pages while their rows are read from a server-side
+# cursor (fetched STREAM_BATCH_SIZE rows at a time); memory then stays flat
+# and MAX_PAGE_SIZE can be raised a lot
+STREAM_LISTINGS = False
+STREAM_BATCH_SIZE = 500
+
+# Search result totals are counted up to this many matches (shown as "1000+")
+SEARCH_COUNT_LIMIT = 1000
+
+
+# Run the independent queries of the venue and artist pages concurrently on
+# FAN_OUT_WORKERS threads (shared by the whole process); pays off when the
+# database is remote, costs up to three pooled connections per page
+PARALLEL_DETAIL_QUERIES = env_flag('PARALLEL_DETAIL_QUERIES', False)
+FAN_OUT_WORKERS = env_int('FAN_OUT_WORKERS', 16)
+
+# JSON API responses smaller than this are sent uncompressed
+API_COMPRESS_MIN_SIZE = 512
+
+# Page cache: 'lru' (in-process), 'redis' (shared between workers) or 'null'.
+# Commits only clear the cache of the worker that made them; every cached
+# page is also keyed on its ETag, so writes from other workers are seen too.
+CACHE_TYPE = os.environ.get('CACHE_TYPE', 'lru')
+CACHE_TTL = 300
+CACHE_MAX_ENTRIES = 1024
+# streamed listings are only buffered for the cache up to this many bytes;
+# larger pages are sent through and not cached
+CACHE_MAX_STREAM_BYTES = 256 * 1024
+CACHE_REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+
+# Request profiling: query count, database and template time per request are
+# sent in a Server-Timing header; requests slower than SLOW_REQUEST_MS are
+# written to SLOW_REQUEST_LOG (JSON lines) with their slowest statements.
+# Off in production unless PROFILE_REQUESTS=1; the database and render time
+# metrics of /metrics come from the same profile
+PROFILE_REQUESTS = env_flag('PROFILE_REQUESTS', not PRODUCTION)
+SLOW_REQUEST_MS = 500
+SLOW_REQUEST_LOG = os.path.join(basedir, 'slow_requests.jsonl')
+SLOW_REQUEST_STATEMENTS = 5
+
+# Compiled templates (Jinja bytecode) are cached in this directory; empty
+# to compile them in every process
+TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR', os.path.join(basedir, '.template_cache'))
+
+# /autocomplete: every worker process keeps the venue and artist names in
+# memory and reloads them this often (seconds) to pick up the names written
+# by other workers
+AUTOCOMPLETE_REFRESH = env_int('AUTOCOMPLETE_REFRESH', 300)
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 20
+
+# /metrics: with several worker processes, point METRICS_DIR at a directory
+# they all share (emptied on deploy) so any worker can report the totals
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = 5
@@ -5,14 +5,24 @@ from fabric.contrib.console import confirm
 
 
 def test():
+    # gates on the query counts and response sizes of benchmark_baseline.json,
+    # refreshed with
+    # python benchmark.py --requests 200 --output benchmark_baseline.json
     with settings(warn_only=True):
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "python -m unittest discover -s tests -t . && "
+            "python benchmark.py --requests 20 --compare benchmark_baseline.json", capture=True
         )
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
 
 
+def benchmark(baseline="benchmark_baseline.json"):
+    # also compares p95 latency and peak RSS, so the baseline should come
+    # from the same machine
+    local("python benchmark.py --requests 200 --compare {} --latency".format(baseline))
+
+
 def commit():
     message = raw_input("Enter a git commit message: ")
     local("git add . && git commit -am '{}'".format(message))
@@ -0,0 +1,47 @@
+import glob
+import multiprocessing
+import os
+
+# gunicorn settings for wsgi.py. Workers and threads come from the
+# environment so they can be sized per host; every worker keeps its own
+# connection pool (see SQLALCHEMY_ENGINE_OPTIONS in config.py).
+
+bind = '0.0.0.0:{}'.format(os.environ.get('PORT', 5000))
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_class = 'gthread'
+timeout = 30
+keepalive = 5
+# recycle workers now and then so slow leaks can't build up
+max_requests = 2000
+max_requests_jitter = 200
+
+# Import the app once in the master and fork the workers from it
+preload_app = True
+
+
+def on_starting(server):
+    # fingerprinted static bundles for this release (see build_assets.py)
+    import build_assets
+    build_assets.build()
+    # the /autocomplete names, compiled templates and configured mappers,
+    # loaded once and shared with the forked workers
+    from app import name_index, preload
+    name_index.index()
+    preload()
+    # totals left over from a previous run, including the archive of its
+    # exited workers, would be added to the new ones
+    metrics_dir = os.environ.get('METRICS_DIR')
+    if metrics_dir:
+        for path in glob.glob(os.path.join(metrics_dir, 'metrics-*.json')):
+            os.remove(path)
+
+
+def post_fork(server, worker):
+    # Connections opened by the master while loading the app must not be
+    # shared with the forked workers; drop them so each worker opens its own.
+    from app import app, db, open_connections
+    for bind in [None] + list(app.config['SQLALCHEMY_BINDS'] or ()):
+        db.get_engine(app, bind).dispose()
+    # runs before the worker accepts requests
+    open_connections()
@@ -0,0 +1,214 @@
+import bisect
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+
+# Prometheus-style metrics behind the /metrics endpoint.
+#
+# Every thread counts into its own dicts, so recording a request takes no
+# lock; a scrape copies and sums the per-thread dicts. When several worker
+# processes serve the app, each one also writes its totals to
+# `<directory>/metrics-<pid>.json` (at most every `flush_interval` seconds)
+# and a scrape, whichever worker answers it, merges all of those files.
+# Counters and histograms of exited workers are kept: a scrape adds their
+# files to `metrics-archive.json` and deletes them. Gauges are only
+# reported for processes that are still alive.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(k, escape(v)) for k, v in pairs) + '}'
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def read_totals(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def merge_totals(merged, data):
+    # adds the counters and histograms of a flushed file to `merged`
+    if data is None:
+        return merged
+    for name, labels, value in data['counters']:
+        key = (name, tuple(map(tuple, labels)))
+        merged['counters'][key] = merged['counters'].get(key, 0) + value
+    for name, labels, value in data['histograms']:
+        key = (name, tuple(map(tuple, labels)))
+        total = merged['histograms'].get(key)
+        merged['histograms'][key] = value if total is None else [a + b for a, b in zip(total, value)]
+    return merged
+
+
+class Registry(object):
+
+    def __init__(self, directory=None, flush_interval=5, buckets=DEFAULT_BUCKETS, gauges=None):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.buckets = tuple(buckets)
+        self.gauges = gauges
+        self.descriptions = {}
+        self._local = threading.local()
+        self._stores = []
+        self._lock = threading.Lock()
+        self._flushed = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def describe(self, name, kind, help):
+        self.descriptions[name] = (kind, help)
+
+    # recording
+
+    def _store(self):
+        store = getattr(self._local, 'store', None)
+        if store is None:
+            store = self._local.store = ({}, {})
+            with self._lock:
+                self._stores.append(store)
+        return store
+
+    def inc(self, name, labels=(), value=1):
+        counters = self._store()[0]
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        histograms = self._store()[1]
+        key = (name, labels)
+        histogram = histograms.get(key)
+        if histogram is None:
+            # one count per bucket, one for +Inf, then the sum
+            histogram = histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        histogram[bisect.bisect_left(self.buckets, value)] += 1
+        histogram[-1] += value
+
+    # collecting
+
+    def snapshot(self):
+        counters = {}
+        histograms = {}
+        with self._lock:
+            stores = list(self._stores)
+        for thread_counters, thread_histograms in stores:
+            # copying a dict or list is atomic under the GIL, summing is not
+            for key, value in list(thread_counters.items()):
+                counters[key] = counters.get(key, 0) + value
+            for key, histogram in list(thread_histograms.items()):
+                histogram = list(histogram)
+                total = histograms.get(key)
+                histograms[key] = histogram if total is None else [a + b for a, b in zip(total, histogram)]
+        gauges = dict(self.gauges()) if self.gauges else {}
+        return {'counters': counters, 'histograms': histograms, 'gauges': gauges}
+
+    def maybe_flush(self):
+        if self.directory and time.time() - self._flushed >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self._flushed = time.time()
+        snapshot = self.snapshot()
+        data = {kind: [[name, list(labels), value] for (name, labels), value in values.items()]
+                for kind, values in snapshot.items()}
+        path = os.path.join(self.directory, 'metrics-{}.json'.format(os.getpid()))
+        with open(path + '.tmp', 'w') as f:
+            json.dump(data, f)
+        os.replace(path + '.tmp', path)
+
+    def collect(self):
+        if not self.directory:
+            return self.snapshot()
+        self.flush()
+        live = []
+        dead = []
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            if path == self._archive_path():
+                continue
+            pid = int(os.path.basename(path)[len('metrics-'):-len('.json')])
+            (live if process_alive(pid) else dead).append((pid, path))
+        merged = self.archive(path for pid, path in dead)
+        merged['gauges'] = {}
+        for pid, path in live:
+            data = read_totals(path)
+            if data is None:
+                continue
+            merge_totals(merged, data)
+            for name, labels, value in data['gauges']:
+                merged['gauges'][(name, tuple(map(tuple, labels)) + (('pid', pid),))] = value
+        return merged
+
+    def _archive_path(self):
+        return os.path.join(self.directory, 'metrics-archive.json')
+
+    def archive(self, paths):
+        # Adds the totals of exited workers to metrics-archive.json and deletes
+        # their files, so the directory doesn't grow with every recycled
+        # worker. The lock keeps two scrapes from archiving a file twice.
+        # Returns the archived counters and histograms.
+        paths = list(paths)
+        archive_path = self._archive_path()
+        if not paths:
+            return merge_totals({'counters': {}, 'histograms': {}}, read_totals(archive_path))
+        with open(os.path.join(self.directory, 'metrics-archive.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            archived = merge_totals({'counters': {}, 'histograms': {}}, read_totals(archive_path))
+            paths = [path for path in paths if os.path.exists(path)]
+            for path in paths:
+                merge_totals(archived, read_totals(path))
+            if paths:
+                data = {kind: [[name, list(labels), value] for (name, labels), value in archived[kind].items()]
+                        for kind in ('counters', 'histograms')}
+                with open(archive_path + '.tmp', 'w') as f:
+                    json.dump(data, f)
+                os.replace(archive_path + '.tmp', archive_path)
+                for path in paths:
+                    os.remove(path)
+        return archived
+
+    # exposition
+
+    def render(self):
+        snapshot = self.collect()
+        series = {}
+        for kind in ('counters', 'histograms', 'gauges'):
+            for (name, labels), value in snapshot[kind].items():
+                series.setdefault(name, []).append((labels, value))
+        lines = []
+        for name in sorted(series):
+            kind, help = self.descriptions.get(name, ('untyped', ''))
+            lines.append('# HELP {} {}'.format(name, help))
+            lines.append('# TYPE {} {}'.format(name, kind))
+            for labels, value in sorted(series[name]):
+                if kind != 'histogram':
+                    lines.append('{}{} {}'.format(name, format_labels(labels), value))
+                    continue
+                cumulative = 0
+                for bound, count in zip(self.buckets + ('+Inf',), value[:-1]):
+                    cumulative += count
+                    lines.append('{}_bucket{} {}'.format(name, format_labels(labels, [('le', bound)]), cumulative))
+                lines.append('{}_sum{} {}'.format(name, format_labels(labels), value[-1]))
+                lines.append('{}_count{} {}'.format(name, format_labels(labels), cumulative))
+        return '\n'.join(lines) + '\n'
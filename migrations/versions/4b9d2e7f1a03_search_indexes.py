@@ -0,0 +1,45 @@
+"""Trigram indexes for venue and artist search.
+
+Revision ID: 4b9d2e7f1a03
+Revises: c25e62668e67
+Create Date: 2026-10-18 10:12:31.214870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b9d2e7f1a03'
+down_revision = 'c25e62668e67'
+branch_labels = None
+depends_on = None
+
+# The genres columns are left out: they are replaced by the genre table in
+# the next revision, which indexes genre.name instead.
+SEARCH_COLUMNS = {
+    'venue': ['name', 'city', 'state'],
+    'artist': ['name', 'city', 'state'],
+}
+
+
+def upgrade():
+    # pg_trgm lets the search ILIKE '%term%' filters use a GIN index
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, columns in SEARCH_COLUMNS.items():
+        for column in columns:
+            op.create_index(
+                'ix_{}_{}_trgm'.format(table, column), table, [column],
+                postgresql_using='gin',
+                postgresql_ops={column: 'gin_trgm_ops'}
+            )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table, columns in SEARCH_COLUMNS.items():
+        for column in columns:
+            op.drop_index('ix_{}_{}_trgm'.format(table, column), table_name=table)
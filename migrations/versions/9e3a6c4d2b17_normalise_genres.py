@@ -0,0 +1,102 @@
+"""Move the comma separated genres columns into a genre table.
+
+Revision ID: 9e3a6c4d2b17
+Revises: 4b9d2e7f1a03
+Create Date: 2026-10-18 11:40:05.583102
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e3a6c4d2b17'
+down_revision = '4b9d2e7f1a03'
+branch_labels = None
+depends_on = None
+
+genre = sa.table('genre', sa.column('id', sa.Integer), sa.column('name', sa.String))
+
+# (entity table, association table, foreign key column)
+GENRE_LINKS = [
+    ('venue', 'venue_genre', 'venue_id'),
+    ('artist', 'artist_genre', 'artist_id'),
+]
+
+
+def upgrade():
+    op.create_table('genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    for table, link_table, key in GENRE_LINKS:
+        op.create_table(link_table,
+        sa.Column(key, sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint([key], [table + '.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['genre_id'], ['genre.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint(key, 'genre_id')
+        )
+        op.create_index('ix_{}_genre_id'.format(link_table), link_table, ['genre_id', key])
+    if op.get_bind().dialect.name == 'postgresql':
+        # the search filters genres with genre.name ILIKE '%term%'
+        op.create_index(
+            'ix_genre_name_trgm', 'genre', ['name'],
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'}
+        )
+
+    # Data migration: split the existing strings (joined with ',' or ', '
+    # depending on which controller wrote them) into rows
+    conn = op.get_bind()
+    entity_genres = {}
+    for table, link_table, key in GENRE_LINKS:
+        rows = conn.execute(sa.text('SELECT id, genres FROM {}'.format(table)))
+        entity_genres[table] = [
+            (entity_id, list(dict.fromkeys(name.strip() for name in (genres or '').split(',') if name.strip())))
+            for entity_id, genres in rows
+        ]
+    names = sorted(set(
+        name for rows in entity_genres.values() for entity_id, entity_names in rows for name in entity_names
+    ))
+    if names:
+        conn.execute(genre.insert(), [{'name': name} for name in names])
+    genre_ids = {name: genre_id for genre_id, name in conn.execute(sa.select([genre.c.id, genre.c.name]))}
+
+    for table, link_table, key in GENRE_LINKS:
+        links = [
+            {key: entity_id, 'genre_id': genre_ids[name]}
+            for entity_id, entity_names in entity_genres[table]
+            for name in entity_names
+        ]
+        if links:
+            link = sa.table(link_table, sa.column(key, sa.Integer), sa.column('genre_id', sa.Integer))
+            conn.execute(link.insert(), links)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('genres')
+
+
+def downgrade():
+    conn = op.get_bind()
+    for table, link_table, key in GENRE_LINKS:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('genres', sa.String(), nullable=True))
+        genres = {}
+        rows = conn.execute(sa.text(
+            'SELECT l.{key}, g.name FROM {link} l JOIN genre g ON g.id = l.genre_id '
+            'ORDER BY l.{key}, g.name'.format(key=key, link=link_table)
+        ))
+        for entity_id, name in rows:
+            genres.setdefault(entity_id, []).append(name)
+        for entity_id, names in genres.items():
+            conn.execute(
+                sa.text('UPDATE {} SET genres = :genres WHERE id = :id'.format(table)),
+                {'genres': ','.join(names), 'id': entity_id}
+            )
+        op.drop_index('ix_{}_genre_id'.format(link_table), table_name=link_table)
+        op.drop_table(link_table)
+    if conn.dialect.name == 'postgresql':
+        op.drop_index('ix_genre_name_trgm', table_name='genre')
+    op.drop_table('genre')
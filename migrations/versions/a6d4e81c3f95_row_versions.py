@@ -0,0 +1,44 @@
+"""Row version and updated_at columns on venue, artist and show.
+
+Revision ID: a6d4e81c3f95
+Revises: f3a7c2d91b54
+Create Date: 2026-10-18 20:11:37.840126
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d4e81c3f95'
+down_revision = 'f3a7c2d91b54'
+branch_labels = None
+depends_on = None
+
+TABLES = ['venue', 'artist', 'show']
+
+
+def upgrade():
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    for table in TABLES:
+        op.add_column(table, sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+        # SQLite only adds NOT NULL columns with a constant default; the
+        # existing rows get the current time right after
+        op.add_column(table, sa.Column(
+            'updated_at', sa.DateTime(), nullable=False,
+            server_default=sa.text("'1970-01-01 00:00:00'") if sqlite else sa.text("timezone('utc', now())")
+        ))
+        if sqlite:
+            op.execute(sa.table(table, sa.column('updated_at', sa.DateTime)).update().values(
+                updated_at=sa.func.current_timestamp()))
+        # max(updated_at) validates the listing pages
+        op.create_index('ix_{}_updated_at'.format(table), table, ['updated_at'])
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        op.drop_index('ix_{}_updated_at'.format(table), table_name=table)
+        # plain columns: dropped in place (SQLite 3.35+), without a batch copy
+        # of the table
+        op.drop_column(table, 'updated_at')
+        op.drop_column(table, 'version')
@@ -0,0 +1,60 @@
+"""Upcoming and past show counters on venues and artists.
+
+Revision ID: b8e1f4a2c907
+Revises: d51f08a3c6e2
+Create Date: 2026-10-18 17:22:41.306518
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e1f4a2c907'
+down_revision = 'd51f08a3c6e2'
+branch_labels = None
+depends_on = None
+
+show = sa.table('show', sa.column('id', sa.Integer), sa.column('venue_id', sa.Integer),
+                sa.column('artist_id', sa.Integer), sa.column('start_time', sa.DateTime),
+                sa.column('counted_past', sa.Boolean))
+
+# (entity table, foreign key column of show)
+COUNTED = [
+    ('venue', 'venue_id'),
+    ('artist', 'artist_id'),
+]
+
+
+def upgrade():
+    for table, key in COUNTED:
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), nullable=False, server_default='0'))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('show', sa.Column('counted_past', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+    op.execute(show.update().values(counted_past=show.c.start_time < datetime.now()))
+    for table, key in COUNTED:
+        entity = sa.table(table, sa.column('id', sa.Integer), sa.column('upcoming_shows_count', sa.Integer),
+                          sa.column('past_shows_count', sa.Integer))
+
+        def shows(past):
+            return sa.select([sa.func.count(show.c.id)]).where(
+                sa.and_(show.c[key] == entity.c.id, show.c.counted_past == past)
+            ).as_scalar()
+        op.execute(entity.update().values(upcoming_shows_count=shows(False), past_shows_count=shows(True)))
+
+    # the shows rollover_shows() still has to move
+    op.create_index('ix_show_counted_past_start_time', 'show', ['counted_past', 'start_time'])
+
+
+def downgrade():
+    op.drop_index('ix_show_counted_past_start_time', table_name='show')
+    with op.batch_alter_table('show') as batch_op:
+        batch_op.drop_column('counted_past')
+    # plain integer columns: dropped in place (SQLite 3.35+), without a
+    # batch copy of the venue and artist tables
+    for table, key in reversed(COUNTED):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
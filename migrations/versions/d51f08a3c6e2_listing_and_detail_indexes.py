@@ -0,0 +1,34 @@
+"""Indexes for the show foreign keys and the listing sort orders.
+
+Revision ID: d51f08a3c6e2
+Revises: 9e3a6c4d2b17
+Create Date: 2026-10-18 13:05:47.902214
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd51f08a3c6e2'
+down_revision = '9e3a6c4d2b17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # detail pages: shows of one venue/artist ordered by start time
+    op.create_index('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time'])
+    op.create_index('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time'])
+    # listing pages: keyset pagination order of /shows, /venues and /artists
+    op.create_index('ix_show_start_time', 'show', ['start_time', 'id'])
+    op.create_index('ix_venue_city_state', 'venue', ['city', 'state', 'id'])
+    op.create_index('ix_artist_name', 'artist', ['name', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_artist_name', table_name='artist')
+    op.drop_index('ix_venue_city_state', table_name='venue')
+    op.drop_index('ix_show_start_time', table_name='show')
+    op.drop_index('ix_show_artist_id_start_time', table_name='show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='show')
@@ -0,0 +1,54 @@
+"""Copy the artist and venue columns the show pages display onto show.
+
+Revision ID: f3a7c2d91b54
+Revises: b8e1f4a2c907
+Create Date: 2026-10-18 19:04:12.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a7c2d91b54'
+down_revision = 'b8e1f4a2c907'
+branch_labels = None
+depends_on = None
+
+# (entity table, foreign key column of show, {show column: (entity column, nullable)})
+COPIES = [
+    ('artist', 'artist_id', {'artist_name': ('name', False), 'artist_image_link': ('image_link', True)}),
+    ('venue', 'venue_id', {'venue_name': ('name', False), 'venue_city': ('city', False),
+                           'venue_state': ('state', False), 'venue_image_link': ('image_link', True)}),
+]
+
+
+def upgrade():
+    for table, key, columns in COPIES:
+        for column in columns:
+            # artist_image_link exists already, until now only filled by create_samples.py
+            if column != 'artist_image_link':
+                op.add_column('show', sa.Column(column, sa.String(), nullable=True))
+
+    show = sa.table('show', *[sa.column(c, sa.String) for _, _, columns in COPIES for c in columns],
+                    sa.column('artist_id', sa.Integer), sa.column('venue_id', sa.Integer))
+    for table, key, columns in COPIES:
+        entity = sa.table(table, sa.column('id', sa.Integer), *[sa.column(c, sa.String) for c, _ in columns.values()])
+        op.execute(show.update().values({
+            column: sa.select([entity.c[source]]).where(entity.c.id == show.c[key]).as_scalar()
+            for column, (source, nullable) in columns.items()
+        }))
+
+    with op.batch_alter_table('show') as batch_op:
+        for table, key, columns in COPIES:
+            for column, (source, nullable) in columns.items():
+                if not nullable:
+                    batch_op.alter_column(column, existing_type=sa.String(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('show') as batch_op:
+        for table, key, columns in reversed(COPIES):
+            for column in reversed(list(columns)):
+                if column != 'artist_image_link':
+                    batch_op.drop_column(column)
@@ -2,3 +2,34 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Name suggestions for the search boxes, from /autocomplete
+document.addEventListener('DOMContentLoaded', function () {
+  var inputs = document.querySelectorAll('input[data-autocomplete]');
+  Array.prototype.forEach.call(inputs, function (input) {
+    var list = document.getElementById(input.getAttribute('list'));
+    var timer = null;
+    var last = '';
+    input.addEventListener('input', function () {
+      clearTimeout(timer);
+      timer = setTimeout(function () {
+        var term = input.value.trim();
+        if (!term || term === last) {
+          return;
+        }
+        last = term;
+        var url = '/autocomplete?type=' + input.getAttribute('data-autocomplete') + '&q=' + encodeURIComponent(term);
+        fetch(url).then(function (response) {
+          return response.json();
+        }).then(function (payload) {
+          list.innerHTML = '';
+          payload.data.forEach(function (match) {
+            var option = document.createElement('option');
+            option.value = match.name;
+            list.appendChild(option);
+          });
+        });
+      }, 100);
+    });
+  });
+});
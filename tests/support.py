@@ -0,0 +1,39 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, cache, db
+
+
+class DatabaseTestCase(unittest.TestCase):
+    # Every test gets an empty SQLite database with the current models.
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(self.directory, 'test.db')
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.context = app.app_context()
+        self.context.push()
+        db.create_all()
+        cache.clear()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.get_engine().dispose()
+        self.context.pop()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def add_show(artist, venue, start_time):
+    # shows carry copies of the artist and venue columns, as in create_show_submission
+    from app import Show, fill_show
+    show = Show(artist_id=artist.id, venue_id=venue.id, start_time=start_time)
+    fill_show(show)
+    db.session.add(show)
+    return show
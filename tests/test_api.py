@@ -0,0 +1,35 @@
+import unittest
+
+from sqlalchemy import event
+
+from tests.support import DatabaseTestCase, db
+from app import Artist, Venue
+
+
+class ApiTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        db.session.add_all([Venue(name='Hall', city='Austin', state='TX', address='x'),
+                            Artist(name='Band', city='Austin', state='TX')])
+        db.session.commit()
+
+    def test_invalid_cursor_is_a_json_error(self):
+        response = self.client.get('/api/v1/artists?after=garbage')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json(), {"success": False, "error": "Invalid cursor"})
+
+    def test_revalidation_runs_only_the_validator(self):
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(1))
+        for url in ('/api/v1/venues', '/api/v1/venues/1', '/api/v1/artists', '/api/v1/artists/1', '/api/v1/shows'):
+            with self.subTest(url=url):
+                etag = self.client.get(url).headers['ETag']
+                del statements[:]
+                response = self.client.get(url, headers={'If-None-Match': etag})
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(len(statements), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
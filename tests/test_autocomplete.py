@@ -0,0 +1,44 @@
+import unittest
+
+from autocomplete import PrefixIndex
+
+
+class PrefixIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = PrefixIndex([
+            ('artist', 1, 'Guns N Petals'),
+            ('venue', 1, 'Gun Club'),
+            ('artist', 2, 'gunther'),
+            ('venue', 2, 'The Dueling Pianos Bar'),
+        ])
+
+    def test_search_merges_kinds_in_name_order(self):
+        self.assertEqual(self.index.search('gun'), [
+            ('venue', 1, 'Gun Club'),
+            ('artist', 1, 'Guns N Petals'),
+            ('artist', 2, 'gunther'),
+        ])
+        self.assertEqual(self.index.search('gun', limit=2), [
+            ('venue', 1, 'Gun Club'),
+            ('artist', 1, 'Guns N Petals'),
+        ])
+
+    def test_search_by_kind(self):
+        self.assertEqual(self.index.search('gun', kind='venue'), [('venue', 1, 'Gun Club')])
+        self.assertEqual(self.index.search('the', kind='artist'), [])
+
+    def test_changes(self):
+        self.index.replace('artist', 2, 'Gunslinger')
+        self.index.remove('venue', 1)
+        self.index.add('venue', 3, 'Gunpowder')
+        self.assertEqual(self.index.search('gun'), [
+            ('venue', 3, 'Gunpowder'),
+            ('artist', 1, 'Guns N Petals'),
+            ('artist', 2, 'Gunslinger'),
+        ])
+        self.assertEqual(len(self.index), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
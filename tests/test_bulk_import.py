@@ -0,0 +1,38 @@
+import unittest
+
+from tests.support import DatabaseTestCase, db
+from app import Artist, Venue, get_genres
+from bulk_import import CatalogueLoader
+
+
+class LoadEntitiesTest(DatabaseTestCase):
+
+    def load(self, kind, records):
+        CatalogueLoader(db.engine, db.metadata, report=lambda message: None).load_records(kind, records)
+
+    def genres(self, model):
+        return {entity.id: [genre.name for genre in entity.genres] for entity in model.query.order_by(model.id)}
+
+    def test_duplicate_artist_names_in_one_batch(self):
+        self.load('artist', [
+            {'name': 'Same', 'city': 'A', 'state': 'CA', 'genres': 'Jazz'},
+            {'name': 'Same', 'city': 'B', 'state': 'NY', 'genres': 'Jazz,Blues'},
+        ])
+        self.assertEqual(self.genres(Artist), {1: ['Jazz'], 2: ['Blues', 'Jazz']})
+
+    def test_artist_named_like_an_existing_one(self):
+        db.session.add(Artist(name='Same', city='A', state='CA', genres=get_genres(['Jazz'])))
+        db.session.commit()
+        self.load('artist', [{'name': 'Same', 'city': 'B', 'state': 'NY', 'genres': 'Blues'}])
+        self.assertEqual(self.genres(Artist), {1: ['Jazz'], 2: ['Blues']})
+
+    def test_duplicate_venues(self):
+        self.load('venue', [
+            {'name': 'Hall', 'city': 'A', 'state': 'CA', 'address': 'x', 'genres': 'Rock n Roll'},
+            {'name': 'Hall', 'city': 'A', 'state': 'CA', 'address': 'y', 'genres': 'Rock n Roll,Folk'},
+        ])
+        self.assertEqual(self.genres(Venue), {1: ['Rock n Roll'], 2: ['Folk', 'Rock n Roll']})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+
+from tests.support import DatabaseTestCase, app, db
+from app import Artist
+
+
+class StreamedPageCacheTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.byte_limit = app.config['CACHE_MAX_STREAM_BYTES']
+        app.config['STREAM_LISTINGS'] = True
+        db.session.add_all([Artist(name='Artist %d' % i, city='Austin', state='TX') for i in range(20)])
+        db.session.commit()
+
+    def tearDown(self):
+        app.config['STREAM_LISTINGS'] = False
+        app.config['CACHE_MAX_STREAM_BYTES'] = self.byte_limit
+        super().tearDown()
+
+    def test_small_streamed_page_is_cached(self):
+        first = self.client.get('/artists')
+        self.assertEqual(first.headers['X-Cache'], 'MISS')
+        # the page is stored once the streamed body has been sent
+        self.assertIn(b'Artist 19', first.data)
+        second = self.client.get('/artists')
+        self.assertEqual(second.headers['X-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+
+    def test_page_over_the_byte_limit_is_not_cached(self):
+        app.config['CACHE_MAX_STREAM_BYTES'] = 1024
+        first = self.client.get('/artists')
+        self.assertGreater(len(first.data), 1024)
+        self.assertIn(b'Artist 19', first.data)
+        self.assertEqual(self.client.get('/artists').headers['X-Cache'], 'MISS')
+
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,40 @@
+import unittest
+from datetime import datetime, timedelta
+
+from tests.support import DatabaseTestCase, add_show, db
+from app import Artist, Show, Venue
+
+
+class TimelineTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.artist = Artist(name='Early Bird', city='Austin', state='TX')
+        self.venue = Venue(name='Hall', city='Austin', state='TX', address='x')
+        db.session.add_all([self.artist, self.venue])
+        db.session.commit()
+        add_show(self.artist, self.venue, datetime.now() + timedelta(days=1))
+        db.session.commit()
+
+    def test_writes_from_other_processes_change_the_page(self):
+        # a show written by another worker does not clear this process's page cache
+        for url in ('/shows/timeline', '/shows/weekend/Austin'):
+            first = self.client.get(url)
+            late = Artist(name='Late Comer', city='Austin', state='TX')
+            db.session.add(late)
+            db.session.commit()
+            show = add_show(late, self.venue, datetime.now() + timedelta(days=1))
+            values = {c.name: getattr(show, c.name) for c in Show.__table__.columns if getattr(show, c.name) is not None}
+            db.session.expunge(show)
+            db.engine.execute(Show.__table__.insert(), values, counted_past=False)
+
+            second = self.client.get(url, headers={'If-None-Match': first.headers['ETag']})
+            self.assertEqual(second.status_code, 200)
+            self.assertNotEqual(second.headers['ETag'], first.headers['ETag'])
+            if url == '/shows/timeline':
+                self.assertIn(b'Late Comer', second.data)
+            self.assertEqual(self.client.get(url, headers={'If-None-Match': second.headers['ETag']}).status_code, 304)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,23 @@
+import unittest
+
+from tests.support import DatabaseTestCase, db
+from app import INDEX_CHECKS, explain
+
+
+class IndexUsageTest(DatabaseTestCase):
+    # The same checks as `flask check-indexes`: every hot query's plan must
+    # name the index it was written for.
+
+    def test_hot_queries_use_their_index(self):
+        for description, query, index in INDEX_CHECKS:
+            with self.subTest(description):
+                self.assertIn(index, explain(query()))
+
+    def test_a_missing_index_fails_the_check(self):
+        db.session.execute(db.text('DROP INDEX ix_show_start_time'))
+        description, query, index = next(check for check in INDEX_CHECKS if check[0] == 'shows listing')
+        self.assertNotIn(index, explain(query()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from metrics import Registry
+
+
+class DeadWorkerMetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.registry = Registry(self.directory, flush_interval=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write_worker(self, count):
+        # the totals file of a worker that has exited
+        worker = subprocess.Popen([sys.executable, '-c', ''])
+        worker.wait()
+        with open(os.path.join(self.directory, 'metrics-{}.json'.format(worker.pid)), 'w') as f:
+            json.dump({'counters': [['requests_total', [['endpoint', 'venues']], count]],
+                       'histograms': [['duration_seconds', [], [count, 0, count * 0.5]]],
+                       'gauges': [['pool_size', [], 5]]}, f)
+
+    def test_dead_workers_are_archived(self):
+        self.registry.buckets = (1.0,)
+        self.registry.inc('requests_total', (('endpoint', 'venues'),), 1)
+        self.write_worker(2)
+        self.write_worker(3)
+        for _ in range(2):
+            totals = self.registry.collect()
+            self.assertEqual(totals['counters'][('requests_total', (('endpoint', 'venues'),))], 6)
+            self.assertEqual(totals['histograms'][('duration_seconds', ())], [5, 0, 2.5])
+            self.assertEqual(list(totals['gauges']), [])
+            self.assertEqual(sorted(name for name in os.listdir(self.directory) if name.endswith('.json')),
+                             ['metrics-{}.json'.format(os.getpid()), 'metrics-archive.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from tests.support import DatabaseTestCase, add_show, db
+from app import Artist, Venue, get_genres
+
+
+class DetailPageQueriesTest(DatabaseTestCase):
+    # The detail pages load the entity, its genres and all its shows with a
+    # fixed number of statements (plus one for the ETag), however many shows
+    # there are.
+
+    STATEMENTS = 4
+
+    def setUp(self):
+        super().setUp()
+        self.statements = []
+        event.listen(db.engine, 'before_cursor_execute', self.record)
+
+    def tearDown(self):
+        event.remove(db.engine, 'before_cursor_execute', self.record)
+        super().tearDown()
+
+    def record(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def statements_for(self, url):
+        del self.statements[:]
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(self.statements)
+
+    def test_statements_do_not_grow_with_shows(self):
+        venue = Venue(name='Hall', city='Austin', state='TX', address='x', genres=get_genres(['Jazz', 'Blues']))
+        artists = [Artist(name='Artist {}'.format(i), city='Austin', state='TX', genres=get_genres(['Jazz']))
+                   for i in range(10)]
+        db.session.add_all([venue] + artists)
+        db.session.commit()
+        for shows in (1, 10):
+            for i, artist in enumerate(artists[:shows]):
+                add_show(artist, venue, datetime.now() + timedelta(days=i - 5))
+            db.session.commit()
+            self.assertEqual(self.statements_for('/venues/{}'.format(venue.id)), self.STATEMENTS)
+            self.assertEqual(self.statements_for('/artists/{}'.format(artists[0].id)), self.STATEMENTS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import shutil
+import sqlite3
+import unittest
+
+from tests.support import DatabaseTestCase, app, db
+from app import Venue
+
+
+class ReplicaRoutingTest(DatabaseTestCase):
+    # The replica is a copy of the test database with the venue renamed, so
+    # every page shows which database it was read from.
+
+    def setUp(self):
+        super().setUp()
+        db.session.add(Venue(name='Hall', city='Austin', state='TX', address='1 Main St'))
+        db.session.commit()
+        self.primary = os.path.join(self.directory, 'test.db')
+        self.replica = os.path.join(self.directory, 'replica.db')
+        shutil.copy(self.primary, self.replica)
+        self.execute(self.replica, "UPDATE venue SET name = 'Replica Hall'")
+        self.binds = app.config['SQLALCHEMY_BINDS']
+        app.config['SQLALCHEMY_BINDS'] = {'replica0': 'sqlite:///' + self.replica}
+        # g belongs to the app context; without one pushed here every request
+        # gets its own, as it does when served, instead of sharing the bind
+        # picked by an earlier request
+        db.session.remove()
+        self.context.pop()
+
+    def tearDown(self):
+        self.context.push()
+        db.get_engine(bind='replica0').dispose()
+        app.config['SQLALCHEMY_BINDS'] = self.binds
+        super().tearDown()
+
+    def execute(self, path, statement):
+        connection = sqlite3.connect(path)
+        try:
+            rows = connection.execute(statement).fetchall()
+            connection.commit()
+            return rows
+        finally:
+            connection.close()
+
+    def create_venue(self, client):
+        return client.post('/venues/create', data={
+            'name': 'New Place', 'city': 'Austin', 'state': 'TX', 'address': '2 Main St',
+            'phone': '123-123-1234', 'genres': ['Jazz'], 'facebook_link': 'https://facebook.com/newplace'
+        })
+
+    def test_reads_go_to_the_replica(self):
+        self.assertIn(b'Replica Hall', self.client.get('/venues/1').data)
+        self.assertIn(b'Replica Hall', self.client.get('/api/v1/venues/1').data)
+
+    def test_writes_go_to_the_primary(self):
+        self.assertEqual(self.create_venue(self.client).status_code, 302)
+        query = "SELECT count(*) FROM venue WHERE name = 'New Place'"
+        self.assertEqual(self.execute(self.primary, query), [(1,)])
+        self.assertEqual(self.execute(self.replica, query), [(0,)])
+
+    def test_writer_reads_from_the_primary_for_a_while(self):
+        self.assertIn(b'Replica Hall', self.client.get('/venues/1').data)
+        self.create_venue(self.client)
+        page = self.client.get('/venues/1').data
+        self.assertIn(b'Hall', page)
+        self.assertNotIn(b'Replica Hall', page)
+        # other clients still read from the replica
+        self.assertIn(b'Replica Hall', app.test_client().get('/venues/1').data)
+
+        app.config['REPLICA_STICKY_SECONDS'], sticky = 0, app.config['REPLICA_STICKY_SECONDS']
+        try:
+            self.create_venue(self.client)
+            self.assertIn(b'Replica Hall', self.client.get('/venues/1').data)
+        finally:
+            app.config['REPLICA_STICKY_SECONDS'] = sticky
+
+
+if __name__ == '__main__':
+    unittest.main()
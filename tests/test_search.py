@@ -0,0 +1,62 @@
+import json
+import unittest
+
+from tests.support import DatabaseTestCase, app, db
+from app import Venue, encode_cursor
+
+
+class SearchPagingTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        db.session.add_all([
+            Venue(name='{} {:02d}'.format('Hop' if i % 3 == 0 else 'Big Hop', i), city='Austin', state='TX', address='x')
+            for i in range(25)
+        ] + [Venue(name='Elsewhere', city='Boston', state='MA', address='x')])
+        db.session.commit()
+
+    def search(self, **args):
+        response = self.client.get('/api/v1/venues/search', query_string=dict(search_term='hop', limit=10, **args))
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.data)
+
+    def test_pages_by_cursor(self):
+        names = []
+        result = self.search()
+        pages = [result]
+        while result['next']:
+            result = self.search(after=result['next'])
+            pages.append(result)
+        for result in pages:
+            self.assertEqual(result['count'], 25)
+            names += [venue['name'] for venue in result['data']]
+        # prefix matches first, then by name
+        self.assertEqual(names, sorted(names, key=lambda name: (not name.startswith('Hop'), name)))
+        self.assertEqual(len(set(names)), 25)
+        self.assertEqual(len(pages), 3)
+
+        back = self.search(before=pages[2]['prev'])
+        self.assertEqual(back['data'], pages[1]['data'])
+
+    def test_count_past_the_end(self):
+        # (rank, name, id) after every match
+        result = self.search(after=encode_cursor([1, 'zzz', 0]))
+        self.assertEqual((result['data'], result['count']), ([], 25))
+
+    def test_count_is_capped(self):
+        app.config['SEARCH_COUNT_LIMIT'] = 20
+        try:
+            result = self.search()
+        finally:
+            app.config['SEARCH_COUNT_LIMIT'] = 1000
+        self.assertEqual((result['count'], result['count_capped']), (20, True))
+
+    def test_html_pager(self):
+        response = self.client.get('/venues/search', query_string={'search_term': 'hop', 'limit': 10})
+        self.assertIn(b'search results for "hop": 25<', response.data)
+        self.assertIn(b'search_term=hop', response.data)
+        self.assertIn(b'after=', response.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
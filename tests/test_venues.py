@@ -0,0 +1,34 @@
+import unittest
+
+from tests.support import DatabaseTestCase, app, db
+from app import Venue
+
+
+class VenueAreasTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        db.session.add_all([Venue(name='SF Venue %d' % i, city='San Francisco', state='CA', address='x')
+                            for i in range(app.config['VENUES_PER_AREA'] + 5)])
+        db.session.add(Venue(name='NY Venue', city='New York', state='NY', address='x'))
+        db.session.commit()
+
+    def test_listing_caps_the_venues_of_an_area(self):
+        areas = self.client.get('/api/v1/venues').get_json()['data']
+        self.assertEqual([(area['city'], area['venue_count'], len(area['venues'])) for area in areas], [
+            ('New York', 1, 1),
+            ('San Francisco', app.config['VENUES_PER_AREA'] + 5, app.config['VENUES_PER_AREA']),
+        ])
+        page = self.client.get('/venues').data
+        self.assertIn(b'href="/venues/areas/CA/San%20Francisco"', page)
+        self.assertNotIn(b'href="/venues/areas/NY/New%20York"', page)
+
+    def test_area_page_lists_every_venue(self):
+        page = self.client.get('/venues/areas/CA/San%20Francisco?limit=100').data
+        for i in range(app.config['VENUES_PER_AREA'] + 5):
+            self.assertIn(b'SF Venue %d<' % i, page)
+        self.assertNotIn(b'NY Venue', page)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,24 @@
+import os
+
+# Production entry point:
+#
+#     gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Loads the 'production' settings profile unless FYYUR_CONFIG says otherwise.
+# gunicorn.conf.py warms the app up in its server hooks; other WSGI servers
+# can use the factory instead, e.g. `waitress-serve --call wsgi:create_app`.
+os.environ.setdefault('FYYUR_CONFIG', 'production')
+
+
+def create_app(warm_up=True):
+    # app.py registers its views on a module-level app, so this returns that
+    # app, first warmed up (templates compiled, database connections opened)
+    # unless warm_up is False
+    from app import app, warm_up as warm_up_app
+    if warm_up:
+        warm_up_app()
+    return app
+
+
+app = create_app(warm_up=False)
+from app import db  # noqa: E402